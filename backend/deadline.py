@@ -0,0 +1,49 @@
+"""
+Request deadlines shared between the event loop and blocking RPC threads
+"""
+import time
+import threading
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """Raised inside RPC work once its request has timed out or been abandoned"""
+
+
+class Deadline:
+    """
+    Absolute deadline plus a cancellation flag for one request.
+
+    The event loop cancels it when the client disconnects; blocking code calls
+    `check()` between RPC calls so abandoned work stops at the next boundary.
+    """
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        if self._cancelled.is_set():
+            raise DeadlineExceeded("request was abandoned")
+        if self.expired():
+            raise DeadlineExceeded(f"request deadline of {self.timeout}s exceeded")
+
+
+def check_deadline(deadline: Optional[Deadline]):
+    """`deadline.check()` that tolerates callers without a deadline"""
+    if deadline is not None:
+        deadline.check()
@@ -0,0 +1,271 @@
+"""
+Index management, retention and Parquet archival of verification history.
+
+Aged records are moved out of MongoDB (or the in-memory lists) into
+zstd-compressed Parquet files partitioned by day:
+
+    <archive_dir>/<collection>/date=YYYY-MM-DD/part-<id>.parquet
+
+so months of history can be analysed with pandas without touching the
+database. Run `python history_archive.py --help` for the CLI.
+"""
+import os
+import uuid
+import asyncio
+import logging
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARCHIVE_DIR = Path(__file__).parent / 'archive'
+ARCHIVE_BATCH_SIZE = 50_000
+TTL_INDEX_NAME = "created_at_ttl"
+
+# Columns kept in the archive for each collection
+ARCHIVE_COLUMNS = {
+    "verifications": ["id", "address", "risk_level", "timestamp"],
+    "status_checks": ["id", "client_name", "timestamp"],
+}
+
+INDEXES = {
+    "verifications": [
+        [("id", ASCENDING)],
+        [("address", ASCENDING)],
+        [("risk_level", ASCENDING)],
+        [("timestamp", DESCENDING)],
+    ],
+    "status_checks": [
+        [("id", ASCENDING)],
+        [("timestamp", DESCENDING)],
+    ],
+}
+
+# Partition values look like dates but must compare as strings for pruning
+PARTITIONING = ds.partitioning(pa.schema([("date", pa.string())]), flavor="hive")
+
+
+async def ensure_indexes(db, retention_days: Dict[str, int]):
+    """Create query indexes and sync each collection's TTL index with its retention"""
+    for collection, indexes in INDEXES.items():
+        for keys in indexes:
+            await db[collection].create_index(keys)
+        await _ensure_ttl_index(db, collection, retention_days.get(collection, 0))
+    logger.info("MongoDB indexes ensured")
+
+
+async def index_maintenance(db, retention_days: Dict[str, int]):
+    """ensure_indexes for startup hooks: meant to run as a background task, and only logs failures"""
+    try:
+        await ensure_indexes(db, retention_days)
+    except Exception as e:
+        logger.error(f"Index maintenance failed: {e}")
+
+
+async def _ensure_ttl_index(db, collection: str, days: int):
+    coll = db[collection]
+    existing = await coll.index_information()
+
+    if days <= 0:
+        if TTL_INDEX_NAME in existing:
+            await coll.drop_index(TTL_INDEX_NAME)
+            logger.info(f"Removed TTL retention from {collection}")
+        return
+
+    backfilled = await backfill_created_at(db, collection)
+    if backfilled:
+        logger.info(f"Backfilled created_at on {backfilled} {collection} records")
+
+    seconds = days * 86400
+    if TTL_INDEX_NAME not in existing:
+        await coll.create_index("created_at", name=TTL_INDEX_NAME, expireAfterSeconds=seconds)
+    elif existing[TTL_INDEX_NAME].get("expireAfterSeconds") != seconds:
+        # TTL indexes can't be re-created with new options, only modified
+        await db.command("collMod", collection, index={"name": TTL_INDEX_NAME, "expireAfterSeconds": seconds})
+    logger.info(f"{collection} retention: {days} days")
+
+
+def _as_datetime(value) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value)
+
+
+async def backfill_created_at(db, collection: str) -> int:
+    """Give records written before created_at existed one, so the TTL index covers them"""
+    coll = db[collection]
+    query = {"created_at": {"$exists": False}}
+    total = 0
+
+    while True:
+        docs = await coll.find(query, {"_id": 1, "timestamp": 1}).to_list(ARCHIVE_BATCH_SIZE)
+        if not docs:
+            break
+        now = datetime.now(timezone.utc)
+        updates = []
+        for doc in docs:
+            try:
+                created_at = _as_datetime(doc["timestamp"])
+            except (KeyError, TypeError, ValueError):
+                # Unparseable records start ageing now rather than never
+                created_at = now
+            updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"created_at": created_at}}))
+        await coll.bulk_write(updates, ordered=False)
+        total += len(docs)
+        if len(docs) < ARCHIVE_BATCH_SIZE:
+            break
+
+    return total
+
+
+def write_archive(collection: str, docs: List[Dict], archive_dir: Path) -> List[Path]:
+    """Write records to one Parquet file per day; returns the files written"""
+    df = pd.DataFrame(docs).reindex(columns=ARCHIVE_COLUMNS[collection])
+    df["timestamp"] = pd.to_datetime(df["timestamp"].map(_as_datetime), utc=True)
+
+    paths = []
+    for day, part in df.groupby(df["timestamp"].dt.strftime("%Y-%m-%d")):
+        directory = archive_dir / collection / f"date={day}"
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"part-{uuid.uuid4().hex}.parquet"
+        part.to_parquet(path, compression="zstd", index=False)
+        paths.append(path)
+    return paths
+
+
+async def archive_collection(db, collection: str, cutoff: datetime, archive_dir: Path) -> int:
+    """Move MongoDB records older than `cutoff` into the archive"""
+    coll = db[collection]
+    # Timestamps are stored as UTC ISO strings, which sort chronologically
+    query = {"timestamp": {"$lt": cutoff.isoformat()}}
+    total = 0
+
+    while True:
+        docs = await coll.find(query, {"_id": 0}).sort("timestamp", ASCENDING).to_list(ARCHIVE_BATCH_SIZE)
+        if not docs:
+            break
+        # Only delete once the batch is safely on disk
+        await run_in_threadpool(write_archive, collection, docs, archive_dir)
+        await coll.delete_many({"id": {"$in": [doc["id"] for doc in docs]}})
+        total += len(docs)
+        if len(docs) < ARCHIVE_BATCH_SIZE:
+            break
+
+    return total
+
+
+async def archive_records(collection: str, records: List[Dict], cutoff: datetime, archive_dir: Path) -> int:
+    """Move in-memory records older than `cutoff` into the archive"""
+    aged = [r for r in records if _as_datetime(r["timestamp"]) < cutoff]
+    if not aged:
+        return 0
+
+    await run_in_threadpool(write_archive, collection, aged, archive_dir)
+    # Re-filter rather than reuse `aged`: new records may have arrived meanwhile
+    records[:] = [r for r in records if _as_datetime(r["timestamp"]) >= cutoff]
+    return len(aged)
+
+
+async def run_archival(
+    db,
+    memory_stores: Optional[Dict[str, List[Dict]]],
+    older_than_days: int,
+    archive_dir: Path,
+) -> Dict[str, int]:
+    """Archive every collection once; returns records archived per collection"""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+    archived = {}
+    for collection in ARCHIVE_COLUMNS:
+        if db is not None:
+            archived[collection] = await archive_collection(db, collection, cutoff, archive_dir)
+        else:
+            archived[collection] = await archive_records(collection, memory_stores[collection], cutoff, archive_dir)
+    logger.info(f"Archived records older than {older_than_days} days: {archived}")
+    return archived
+
+
+async def archival_loop(
+    db,
+    memory_stores: Optional[Dict[str, List[Dict]]],
+    older_than_days: int,
+    archive_dir: Path,
+    interval: float,
+    on_change: Optional[Callable[[], Awaitable]] = None,
+):
+    """Run archival every `interval` seconds until cancelled"""
+    while True:
+        try:
+            archived = await run_archival(db, memory_stores, older_than_days, archive_dir)
+            if on_change and any(archived.values()):
+                await on_change()
+        except Exception as e:
+            logger.error(f"Archival run failed: {e}")
+        await asyncio.sleep(interval)
+
+
+def load_archive(
+    collection: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    archive_dir: Path = DEFAULT_ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """Load archived records with `start <= day < end`, reading only matching partitions"""
+    path = archive_dir / collection
+    if not path.exists():
+        return pd.DataFrame(columns=ARCHIVE_COLUMNS[collection])
+
+    filters = []
+    if start:
+        filters.append(("date", ">=", start.isoformat()))
+    if end:
+        filters.append(("date", "<", end.isoformat()))
+    return pd.read_parquet(path, filters=filters or None, partitioning=PARTITIONING)
+
+
+def daily_risk_summary(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    archive_dir: Path = DEFAULT_ARCHIVE_DIR,
+) -> pd.DataFrame:
+    """Verifications per day and risk level from the archive"""
+    df = load_archive("verifications", start, end, archive_dir)
+    if df.empty:
+        return pd.DataFrame()
+    return pd.crosstab(df["date"], df["risk_level"])
+
+
+if __name__ == "__main__":
+    import typer
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    cli = typer.Typer(help="Verification history archive tools")
+    env_archive_dir = Path(os.environ.get('ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR))
+
+    @cli.command()
+    def run(older_than_days: int = typer.Option(int(os.environ.get('ARCHIVE_AFTER_DAYS', '30')))):
+        """Move MongoDB records older than N days into the archive"""
+        mongo_url = os.environ.get('MONGO_URL', '')
+        if not mongo_url:
+            raise typer.BadParameter("MONGO_URL is not set")
+        client = AsyncIOMotorClient(mongo_url)
+        db = client[os.environ.get('DB_NAME', 'ark_protocol')]
+        asyncio.run(run_archival(db, None, older_than_days, env_archive_dir))
+
+    @cli.command()
+    def summary(since: Optional[str] = None, until: Optional[str] = None):
+        """Print verifications per day and risk level (dates as YYYY-MM-DD)"""
+        start = date.fromisoformat(since) if since else None
+        end = date.fromisoformat(until) if until else None
+        print(daily_risk_summary(start, end, env_archive_dir).to_string())
+
+    cli()
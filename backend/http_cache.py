@@ -0,0 +1,100 @@
+"""
+HTTP caching helpers: ETags, conditional requests and the verification cache
+"""
+import json
+import time
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class VersionCounter:
+    """
+    Monotonic data version, bumped on every write that changes read endpoints.
+
+    The count restarts with the process while MongoDB keeps its data, so ETags
+    built from it must also include `epoch`, which is unique to each boot.
+    Methods are async to share an interface with the cross-worker counter.
+    """
+
+    def __init__(self):
+        self.epoch = secrets.token_hex(4)
+        self._value = 0
+        self._lock = threading.Lock()
+
+    async def current(self) -> int:
+        return self._value
+
+    async def bump(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of `etag` against the request's If-None-Match header"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = _strip_weak(etag)
+    return any(_strip_weak(tag.strip()) == opaque for tag in header.split(","))
+
+
+def _strip_weak(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def content_etag(payload: Dict) -> str:
+    """Strong ETag derived from a JSON-serialisable payload"""
+    digest = hashlib.sha1(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+class CachedVerification:
+    __slots__ = ("result", "etag", "expires_at")
+
+    def __init__(self, result: Dict, etag: str, expires_at: float):
+        self.result = result
+        self.etag = etag
+        self.expires_at = expires_at
+
+    def max_age(self) -> int:
+        return max(0, int(self.expires_at - time.time()))
+
+
+class VerificationCache:
+    """LRU cache of recent verification results keyed by address"""
+
+    def __init__(self, ttl: float = 30.0, max_entries: int = 10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CachedVerification]" = OrderedDict()
+
+    async def get(self, address: str) -> Optional[CachedVerification]:
+        entry = self._entries.get(address)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.time():
+            del self._entries[address]
+            return None
+        self._entries.move_to_end(address)
+        return entry
+
+    async def put(self, address: str, result: Dict) -> CachedVerification:
+        entry = CachedVerification(result, content_etag(result), time.time() + self.ttl)
+        self._entries[address] = entry
+        self._entries.move_to_end(address)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
@@ -0,0 +1,113 @@
+"""
+Preforking multi-worker launcher.
+
+Binds the listening socket once, starts the shared state server, then forks
+N uvicorn workers that all accept on that socket. Each worker connects to
+the shared state (data version, verification cache, rate-limit buckets)
+and warms its RPC connection pool before serving traffic. Workers that die
+are restarted. The first worker slot also owns MongoDB index and archival
+maintenance, so it runs once rather than once per worker.
+
+Status checks and verification history only leave process memory with
+MongoDB, so without MONGO_URL the launcher runs a single worker.
+
+    python launcher.py --workers 4 --port 8000
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import logging
+import secrets
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+import typer
+from dotenv import load_dotenv
+
+from shared_state import SOCKET_ENV, AUTHKEY_ENV, start_state_server
+
+ROOT_DIR = Path(__file__).parent
+load_dotenv(ROOT_DIR / '.env')
+logger = logging.getLogger("launcher")
+
+
+def run_worker(sock: socket.socket, maintenance: bool):
+    import uvicorn
+
+    # Imported here, after the fork, so each worker gets its own clients
+    os.environ["WARM_RPC_ON_STARTUP"] = "true"
+    os.environ["HISTORY_MAINTENANCE"] = "true" if maintenance else "false"
+    sys.path.insert(0, str(ROOT_DIR))
+    config = uvicorn.Config("server:app", lifespan="on", log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def effective_workers(requested: int) -> int:
+    if requested > 1 and not os.environ.get("MONGO_URL"):
+        logger.warning(f"MONGO_URL is not set; running 1 worker instead of {requested} so history stays consistent")
+        return 1
+    return max(requested, 1)
+
+
+def main(
+    host: str = "0.0.0.0",
+    port: int = int(os.environ.get("PORT", "8000")),
+    workers: int = int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 1)),
+):
+    """Serve the API with WORKERS processes sharing one socket and one state server"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    workers = effective_workers(workers)
+
+    socket_path = os.path.join(tempfile.gettempdir(), f"ark-state-{os.getpid()}.sock")
+    authkey = secrets.token_bytes(16)
+    manager = start_state_server(socket_path, authkey)
+    os.environ[SOCKET_ENV] = socket_path
+    os.environ[AUTHKEY_ENV] = authkey.hex()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    logger.info(f"Listening on http://{host}:{port} with {workers} workers")
+
+    ctx = multiprocessing.get_context("fork")
+    processes = []
+    stopping = False
+
+    def spawn(slot: int):
+        process = ctx.Process(target=run_worker, args=(sock, slot == 0))
+        process.start()
+        return process
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    processes = [spawn(slot) for slot in range(workers)]
+    try:
+        while not stopping:
+            for slot, process in enumerate(processes):
+                if not process.is_alive() and not stopping:
+                    logger.warning(f"Worker {process.pid} exited with {process.exitcode}, restarting")
+                    processes[slot] = spawn(slot)
+            time.sleep(1)
+    finally:
+        logger.info("Shutting down workers")
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+        for process in processes:
+            process.join(timeout=30)
+        manager.shutdown()
+        sock.close()
+
+
+if __name__ == "__main__":
+    typer.run(main)
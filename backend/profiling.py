@@ -0,0 +1,161 @@
+"""
+Opt-in per-request profiling and slow-request capture.
+
+A request is profiled when it carries `X-Debug-Profile: 1` with a valid
+`X-Admin-Token`, or when it is picked by PROFILE_SAMPLE_RATE. Code marks its
+stages with `with stage("name"):`; outside a profiled request that is a single
+context-var lookup returning a shared no-op context manager.
+"""
+import hmac
+import time
+import random
+import logging
+import contextlib
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_current_profile: ContextVar[Optional["RequestProfile"]] = ContextVar("request_profile", default=None)
+_NO_OP = contextlib.nullcontext()
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.stages: List[Dict] = []
+
+    def record(self, name: str, start: float, end: float):
+        # list.append is atomic, so stages can be recorded from RPC worker threads
+        self.stages.append({
+            "name": name,
+            "start_ms": round((start - self.started) * 1000, 2),
+            "duration_ms": round((end - start) * 1000, 2),
+        })
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "start")
+
+    def __init__(self, profile: RequestProfile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.profile.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+def stage(name: str):
+    """Time a block as a named stage of the current request's profile, if any"""
+    profile = _current_profile.get()
+    if profile is None:
+        return _NO_OP
+    return _Stage(profile, name)
+
+
+def profiling_active() -> bool:
+    return _current_profile.get() is not None
+
+
+class Profiler:
+    """Profiling configuration plus the ring buffer of captured slow requests"""
+
+    def __init__(
+        self,
+        admin_token: str = "",
+        sample_rate: float = 0.0,
+        slow_threshold_ms: float = 2000.0,
+        capacity: int = 100,
+    ):
+        self.admin_token = admin_token
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self.slow_requests = deque(maxlen=capacity)
+
+    def is_admin(self, token: Optional[str]) -> bool:
+        if not self.admin_token or token is None:
+            return False
+        # Constant-time, so response timing doesn't leak the token prefix
+        return hmac.compare_digest(token.encode(), self.admin_token.encode())
+
+    def capture(self, method: str, path: str, status: int, total_ms: float, profile: Optional[RequestProfile]):
+        self.slow_requests.append({
+            "method": method,
+            "path": path,
+            "status": status,
+            "total_ms": round(total_ms, 2),
+            "captured_at": datetime.now(timezone.utc).isoformat(),
+            "stages": profile.stages if profile is not None else None,
+        })
+        logger.warning(f"Slow request: {method} {path} took {total_ms:.0f}ms")
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware that times requests under `paths`.
+
+    Every matching request gets a total timing (two clock reads); profiled
+    requests also get a per-stage breakdown, returned in a Server-Timing header
+    when explicitly requested. Requests slower than the profiler's threshold
+    are kept for the admin endpoint.
+    """
+
+    def __init__(self, app, profiler: Profiler, paths=()):
+        self.app = app
+        self.profiler = profiler
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            await self.app(scope, receive, send)
+            return
+
+        profiler = self.profiler
+        requested = False
+        if profiler.admin_token:
+            headers = dict(scope["headers"])
+            requested = headers.get(b"x-debug-profile") == b"1" and profiler.is_admin(
+                headers.get(b"x-admin-token", b"").decode("latin-1")
+            )
+        profile = None
+        if requested or (profiler.sample_rate and random.random() < profiler.sample_rate):
+            profile = RequestProfile(scope["method"], scope["path"])
+
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                if requested:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"server-timing", self._server_timing(profile, started).encode())
+                    ]
+            await send(message)
+
+        token = _current_profile.set(profile) if profile is not None else None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                _current_profile.reset(token)
+            total_ms = (time.perf_counter() - started) * 1000
+            if total_ms >= profiler.slow_threshold_ms:
+                profiler.capture(scope["method"], scope["path"], status["code"], total_ms, profile)
+
+    @staticmethod
+    def _server_timing(profile: RequestProfile, started: float) -> str:
+        entries = [
+            f'{i};desc="{s["name"]}";dur={s["duration_ms"]}'
+            for i, s in enumerate(profile.stages)
+        ]
+        entries.append(f"total;dur={round((time.perf_counter() - started) * 1000, 2)}")
+        return ", ".join(entries)
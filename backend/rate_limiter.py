@@ -0,0 +1,216 @@
+"""
+Per-client rate limiting and admission control for the API edge
+"""
+import os
+import time
+import math
+import logging
+import threading
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimit:
+    """A GCRA limit: `rate` requests per `period` seconds with a burst allowance"""
+
+    def __init__(self, name: str, rate: int, period: float = 60.0, burst: int = 1):
+        self.name = name
+        self.rate = rate
+        self.period = period
+        self.burst = max(burst, 1)
+        # Time one request "costs" and how far ahead of schedule a client may run
+        self.emission_interval = period / rate
+        self.tolerance = self.emission_interval * self.burst
+
+
+class InMemoryStore:
+    """Process-local GCRA state: client key -> theoretical arrival time (TAT)"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.max_keys = max_keys
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    async def acquire(self, key: str, now: float, interval: float, tolerance: float) -> Tuple[bool, float]:
+        return self.consume(key, now, interval, tolerance)
+
+    def consume(self, key: str, now: float, interval: float, tolerance: float) -> Tuple[bool, float]:
+        """Consume one request for `key`; returns (allowed, retry_after_seconds)"""
+        with self._lock:
+            tat = max(self._tats.get(key, now), now)
+            new_tat = tat + interval
+            allow_at = new_tat - tolerance
+            if now < allow_at:
+                return False, allow_at - now
+            self._tats[key] = new_tat
+            if len(self._tats) > self.max_keys:
+                self._sweep(now)
+            return True, 0.0
+
+    def _sweep(self, now: float):
+        # Keys whose TAT is in the past are indistinguishable from new clients
+        self._tats = {k: tat for k, tat in self._tats.items() if tat > now}
+
+
+class RedisStore:
+    """Shared GCRA state in Redis for multi-worker / multi-instance deployments"""
+
+    # Read-modify-write must be atomic across workers, so GCRA runs server-side
+    _SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local interval = tonumber(ARGV[2])
+    local tolerance = tonumber(ARGV[3])
+    local tat = tonumber(redis.call('GET', KEYS[1]) or ARGV[1])
+    if tat < now then tat = now end
+    local new_tat = tat + interval
+    local allow_at = new_tat - tolerance
+    if now < allow_at then
+        return {0, tostring(allow_at - now)}
+    end
+    redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+    return {1, '0'}
+    """
+
+    def __init__(self, url: str, prefix: str = "ark:rl:"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise RuntimeError("RATE_LIMIT_REDIS_URL is set but the 'redis' package is not installed") from e
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(url)
+        self._script = self.client.register_script(self._SCRIPT)
+
+    async def acquire(self, key: str, now: float, interval: float, tolerance: float) -> Tuple[bool, float]:
+        try:
+            allowed, retry_after = await self._script(keys=[self.prefix + key], args=[now, interval, tolerance])
+            return bool(int(allowed)), float(retry_after)
+        except Exception as e:
+            # Fail open: a limiter outage must not take the API down with it
+            logger.warning(f"Rate limit store unavailable, allowing request: {e}")
+            return True, 0.0
+
+
+class RateLimitMiddleware:
+    """
+    Pure ASGI middleware that applies per-client GCRA limits and load shedding.
+
+    Clients are keyed by `X-API-Key` when it is one of the configured
+    `api_keys`, otherwise by IP address, so made-up keys can't mint new budgets.
+    Behind `proxy_hops` reverse proxies the IP is taken that many entries from
+    the right of X-Forwarded-For: entries further left are written by the
+    client and can't be trusted.
+    Routes are grouped into budgets: expensive routes (which fan out into RPC
+    calls; matched exactly) get a tight limit and are shed with 503 when
+    `is_saturated()` reports the outbound RPC queue is full; everything else
+    shares a generous default budget. Routes that are only sometimes expensive
+    charge the tight budget themselves with `charge()`.
+    """
+
+    def __init__(
+        self,
+        app,
+        store,
+        default_limit: RateLimit,
+        expensive_limit: RateLimit,
+        expensive_paths: Tuple[str, ...] = (),
+        exempt_paths: Tuple[str, ...] = (),
+        is_saturated: Optional[Callable[[], bool]] = None,
+        api_keys: Iterable[str] = (),
+        proxy_hops: int = 0,
+        enabled: bool = True,
+    ):
+        self.app = app
+        self.store = store
+        self.default_limit = default_limit
+        self.expensive_limit = expensive_limit
+        self.expensive_paths = expensive_paths
+        self.exempt_paths = exempt_paths
+        self.is_saturated = is_saturated
+        self.api_keys = frozenset(api_keys)
+        self.proxy_hops = proxy_hops
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send):
+        if not self.enabled or scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        if path in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        expensive = path in self.expensive_paths
+        limit = self.expensive_limit if expensive else self.default_limit
+
+        # Shed before charging, so a 503 doesn't cost the client its retry
+        if expensive and self.is_saturated is not None and self.is_saturated():
+            await self._reject(send, 503, "Server is busy, please retry shortly", 1.0)
+            return
+
+        client = self._client_key(scope)
+        # Lets endpoints charge extra budgets by the size of the work (request.state)
+        scope.setdefault("state", {})["rate_limit_client"] = client
+        allowed, retry_after = await self.store.acquire(
+            f"{limit.name}:{client}",
+            time.time(),
+            limit.emission_interval,
+            limit.tolerance,
+        )
+        if not allowed:
+            await self._reject(send, 429, "Rate limit exceeded", retry_after)
+            return
+
+        await self.app(scope, receive, send)
+
+    def _client_key(self, scope) -> str:
+        headers = dict(scope["headers"])
+        api_key = headers.get(b"x-api-key", b"").decode("latin-1")
+        if api_key and api_key in self.api_keys:
+            return "key:" + api_key
+        if self.proxy_hops:
+            forwarded = [ip.strip() for ip in headers.get(b"x-forwarded-for", b"").decode("latin-1").split(",")]
+            # Each trusted proxy appends the address it received the request from
+            if len(forwarded) >= self.proxy_hops and forwarded[-self.proxy_hops]:
+                return "ip:" + forwarded[-self.proxy_hops]
+        client = scope.get("client")
+        return "ip:" + (client[0] if client else "unknown")
+
+    async def _reject(self, send, status: int, detail: str, retry_after: float):
+        body = ('{"detail":"%s"}' % detail).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def charge(store, limit: RateLimit, client: str, cost: int) -> Tuple[bool, float]:
+    """Consume `cost` requests' worth of `limit` at once; cost must not exceed the burst"""
+    return await store.acquire(f"{limit.name}:{client}", time.time(), limit.emission_interval * cost, limit.tolerance)
+
+
+def limit_from_env(name: str, default_per_minute: int, default_burst: int) -> RateLimit:
+    """Build a per-minute RateLimit from RATE_LIMIT_<NAME>_PER_MINUTE / _BURST"""
+    prefix = f"RATE_LIMIT_{name.upper()}"
+    return RateLimit(
+        name,
+        rate=int(os.environ.get(f"{prefix}_PER_MINUTE", default_per_minute)),
+        period=60.0,
+        burst=int(os.environ.get(f"{prefix}_BURST", default_burst)),
+    )
+
+
+def store_from_env():
+    """Use Redis when RATE_LIMIT_REDIS_URL is set, otherwise in-process state"""
+    redis_url = os.environ.get("RATE_LIMIT_REDIS_URL", "")
+    if redis_url:
+        logger.info("Using Redis for rate limit state")
+        return RedisStore(redis_url)
+    return InMemoryStore()
@@ -0,0 +1,234 @@
+"""
+Priority scheduler for blocking RPC work.
+
+Verifications are blocking (each one makes several Solana RPC calls), so they
+run in worker threads. This scheduler sits in front of those threads and
+decides which job runs next, so bulk screening can't starve the frontend:
+
+- jobs are queued per priority class (interactive, batch, background)
+- free workers pick the next class by weighted fair queuing
+- a few workers are reserved for interactive jobs, and lower classes are
+  paused entirely while interactive queue latency is over its SLO
+"""
+import time
+import asyncio
+import logging
+import contextvars
+from collections import deque
+from typing import Callable, Deque, Dict, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+BACKGROUND = "background"
+PRIORITY_CLASSES = (INTERACTIVE, BATCH, BACKGROUND)
+
+DEFAULT_WEIGHTS = {INTERACTIVE: 8, BATCH: 2, BACKGROUND: 1}
+
+
+class QueueFull(Exception):
+    """Raised when a priority class already has `max_queue` jobs waiting"""
+
+
+class _Job:
+    __slots__ = ("fn", "args", "future", "enqueued_at", "context")
+
+    def __init__(self, fn: Callable, args: tuple, future: asyncio.Future):
+        self.fn = fn
+        self.args = args
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        # Run the job with the submitter's context vars, not the worker's
+        self.context = contextvars.copy_context()
+
+
+class _ClassStats:
+    def __init__(self, samples: int = 512):
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.abandoned = 0
+        self.running = 0
+        self.queue_times: Deque[float] = deque(maxlen=samples)
+        self.queue_time_ewma = 0.0
+
+    def record_queue_time(self, seconds: float):
+        self.queue_times.append(seconds)
+        self.queue_time_ewma = 0.8 * self.queue_time_ewma + 0.2 * seconds
+
+    def snapshot(self) -> Dict:
+        times = sorted(self.queue_times)
+
+        def pct(p: float) -> float:
+            return round(times[min(len(times) - 1, int(p * len(times)))] * 1000, 2) if times else 0.0
+
+        return {
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "abandoned": self.abandoned,
+            "running": self.running,
+            "queue_time_ms": {
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "max": round(times[-1] * 1000, 2) if times else 0.0,
+                "ewma": round(self.queue_time_ewma * 1000, 2),
+            },
+        }
+
+
+class PriorityScheduler:
+    def __init__(
+        self,
+        concurrency: int = 8,
+        weights: Optional[Dict[str, int]] = None,
+        interactive_slo: float = 2.0,
+        reserved_interactive: int = 2,
+        max_queue: int = 1000,
+    ):
+        self.concurrency = concurrency
+        self.weights = dict(weights or DEFAULT_WEIGHTS)
+        self.interactive_slo = interactive_slo
+        self.reserved_interactive = min(reserved_interactive, concurrency - 1)
+        self.max_queue = max_queue
+
+        self._queues: Dict[str, Deque[_Job]] = {c: deque() for c in PRIORITY_CLASSES}
+        self._stats: Dict[str, _ClassStats] = {c: _ClassStats() for c in PRIORITY_CLASSES}
+        # Weighted fair queuing: each class's virtual finish time, and the
+        # start tag of the most recently dispatched job
+        self._finish: Dict[str, float] = {c: 0.0 for c in PRIORITY_CLASSES}
+        self._virtual_now = 0.0
+        self._cond: Optional[asyncio.Condition] = None
+        self._workers = []
+
+    def start(self):
+        """Spawn worker tasks on the running event loop (idempotent)"""
+        if self._workers:
+            return
+        self._cond = asyncio.Condition()
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        logger.info(f"Scheduler started with {self.concurrency} workers")
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def submit(self, fn: Callable, *args, priority: str = INTERACTIVE):
+        """Queue `fn(*args)` to run in a worker thread and wait for its result"""
+        if priority not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority}")
+        self.start()
+
+        stats = self._stats[priority]
+        queue = self._queues[priority]
+        if len(queue) >= self.max_queue:
+            stats.rejected += 1
+            raise QueueFull(f"{priority} queue is full")
+
+        job = _Job(fn, args, asyncio.get_running_loop().create_future())
+        async with self._cond:
+            if not queue:
+                # A class returning from idle must not cash in on the service
+                # it didn't use while it was empty
+                self._finish[priority] = max(self._finish[priority], self._virtual_now)
+            queue.append(job)
+            stats.submitted += 1
+            self._cond.notify()
+        return await job.future
+
+    def queued(self, priority: Optional[str] = None) -> int:
+        if priority is not None:
+            return len(self._queues[priority])
+        return sum(len(q) for q in self._queues.values())
+
+    def interactive_over_slo(self) -> bool:
+        queue = self._queues[INTERACTIVE]
+        if not queue:
+            return False
+        head_wait = time.monotonic() - queue[0].enqueued_at
+        return head_wait > self.interactive_slo or self._stats[INTERACTIVE].queue_time_ewma > self.interactive_slo
+
+    def stats(self) -> Dict:
+        return {
+            "concurrency": self.concurrency,
+            "weights": self.weights,
+            "interactive_slo_ms": self.interactive_slo * 1000,
+            "lower_classes_throttled": self.interactive_over_slo(),
+            "classes": {
+                c: {"queued": len(self._queues[c]), **self._stats[c].snapshot()}
+                for c in PRIORITY_CLASSES
+            },
+        }
+
+    def _next_job(self) -> Optional[tuple]:
+        lower_running = sum(self._stats[c].running for c in PRIORITY_CLASSES if c != INTERACTIVE)
+        lower_allowed = (
+            lower_running < self.concurrency - self.reserved_interactive
+            and not self.interactive_over_slo()
+        )
+
+        best, best_finish = None, None
+        for c in PRIORITY_CLASSES:
+            if not self._queues[c]:
+                continue
+            if c != INTERACTIVE and not lower_allowed:
+                # A paused class doesn't bank the service it missed, or it would
+                # monopolise the workers once throttling lifts
+                self._finish[c] = max(self._finish[c], self._virtual_now)
+                continue
+            # submit() already moved idle classes up to virtual_now; clamping
+            # backlogged ones here too would keep resetting their credit
+            finish = self._finish[c] + 1.0 / self.weights[c]
+            if best is None or finish < best_finish:
+                best, best_finish = c, finish
+
+        if best is None:
+            return None
+        self._virtual_now = max(self._finish[best], self._virtual_now)
+        self._finish[best] = best_finish
+        # Count the job as running before the lock is released so concurrent
+        # workers see the reservation
+        self._stats[best].running += 1
+        return best, self._queues[best].popleft()
+
+    async def _worker(self):
+        while True:
+            async with self._cond:
+                picked = self._next_job()
+                while picked is None:
+                    await self._cond.wait()
+                    picked = self._next_job()
+                if self.queued():
+                    self._cond.notify()
+            priority, job = picked
+            stats = self._stats[priority]
+
+            try:
+                if job.future.cancelled():
+                    # The submitter gave up while the job was queued
+                    stats.abandoned += 1
+                    continue
+                stats.record_queue_time(time.monotonic() - job.enqueued_at)
+                result = await run_in_threadpool(job.context.run, job.fn, *job.args)
+                stats.completed += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                stats.failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                stats.running -= 1
+                # Finishing a job may unblock throttled lower-class jobs
+                async with self._cond:
+                    self._cond.notify_all()
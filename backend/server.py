@@ -1,17 +1,28 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
 from motor.motor_asyncio import AsyncIOMotorClient
 import os
+import math
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import List, Literal, Optional
 import uuid
 from datetime import datetime, timezone
 import random
 import re
 from solana_service import SolanaService
+from snapshot import SnapshotSource
+from rate_limiter import RateLimitMiddleware, charge, limit_from_env, store_from_env
+from scheduler import PriorityScheduler, QueueFull, INTERACTIVE, BATCH, BACKGROUND
+from deadline import Deadline, DeadlineExceeded
+from history_archive import index_maintenance, archival_loop, DEFAULT_ARCHIVE_DIR
+from http_cache import VersionCounter, VerificationCache, CachedVerification, etag_matches, not_modified
+from profiling import Profiler, ProfilingMiddleware, stage, profiling_active
+from shared_state import connect_from_env, SharedRateLimitStore, SharedVersionCounter, SharedVerificationCache
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -39,11 +50,94 @@ else:
     in_memory_status_checks = []
     logger.info("MongoDB not configured - using in-memory storage")
 
+# History retention: MongoDB TTL deletes records after N days (0 = keep forever),
+# while archival moves records older than ARCHIVE_AFTER_DAYS into Parquet files.
+# Keep retention longer than ARCHIVE_AFTER_DAYS so records are archived first.
+RETENTION_DAYS = {
+    "verifications": int(os.environ.get('VERIFICATIONS_RETENTION_DAYS', '0')),
+    "status_checks": int(os.environ.get('STATUS_CHECKS_RETENTION_DAYS', '0')),
+}
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', '0'))
+ARCHIVE_INTERVAL_HOURS = float(os.environ.get('ARCHIVE_INTERVAL_HOURS', '24'))
+ARCHIVE_DIR = Path(os.environ.get('ARCHIVE_DIR', DEFAULT_ARCHIVE_DIR))
+# launcher.py sets this for one worker only, so MongoDB indexes and archival
+# run once per deployment instead of once per worker
+HISTORY_MAINTENANCE = os.environ.get('HISTORY_MAINTENANCE', 'true').lower() == 'true'
+
+# Shared cross-worker state when started by launcher.py, otherwise None and
+# counters, caches and rate-limit buckets are per-process
+shared_store = connect_from_env()
+
+# Max concurrent RPC-bound jobs, and the size of the RPC connection pool
+RPC_CONCURRENCY = int(os.environ.get('RPC_CONCURRENCY', '8'))
+
 # Initialize Solana service
 solana_rpc_url = os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com')
-solana_service = SolanaService(solana_rpc_url)
+# Optional offline snapshot for network-free balance / transaction count lookups
+solana_snapshot_path = os.environ.get('SOLANA_SNAPSHOT_PATH', '')
+solana_service = SolanaService(
+    solana_rpc_url,
+    snapshot=SnapshotSource(solana_snapshot_path) if solana_snapshot_path else None,
+    max_connections=RPC_CONCURRENCY,
+)
 logger.info(f"Solana service initialized with RPC: {solana_rpc_url}")
 
+# Each verification can fan out into up to 11 RPC requests; beyond this many
+# queued, new interactive verifications are shed at the edge
+MAX_PENDING_VERIFICATIONS = int(os.environ.get('MAX_PENDING_VERIFICATIONS', '32'))
+MAX_BATCH_ADDRESSES = int(os.environ.get('MAX_BATCH_ADDRESSES', '100'))
+# Batches are shed once this many batch/background verifications are queued
+MAX_PENDING_BATCH_VERIFICATIONS = int(os.environ.get('MAX_PENDING_BATCH_VERIFICATIONS', '500'))
+
+# Rate-limit state, and the per-address budget batches are charged against
+rate_limit_store = (
+    SharedRateLimitStore(shared_store)
+    if shared_store is not None and not os.environ.get('RATE_LIMIT_REDIS_URL')
+    else store_from_env()
+)
+verify_limit = limit_from_env('verify', 30, 10)
+batch_limit = limit_from_env('batch', 300, MAX_BATCH_ADDRESSES)
+
+# All RPC-bound work goes through the scheduler so bulk jobs can't starve the frontend
+rpc_scheduler = PriorityScheduler(
+    concurrency=RPC_CONCURRENCY,
+    interactive_slo=float(os.environ.get('INTERACTIVE_SLO_MS', '2000')) / 1000,
+    max_queue=int(os.environ.get('MAX_QUEUED_JOBS', '1000')),
+)
+
+# Verification deadlines: clients may ask for a shorter (or up to the maximum)
+# deadline with the X-Request-Timeout header, in seconds
+REQUEST_DEADLINE_SECONDS = float(os.environ.get('REQUEST_DEADLINE_SECONDS', '30'))
+MAX_REQUEST_DEADLINE_SECONDS = float(os.environ.get('MAX_REQUEST_DEADLINE_SECONDS', '60'))
+DISCONNECT_POLL_INTERVAL = 0.25
+
+verification_outcomes = {"completed": 0, "abandoned": 0, "deadline_exceeded": 0}
+
+# HTTP caching: read endpoints are versioned by a counter bumped on every write,
+# and recent verification results are reused for VERIFY_CACHE_TTL_SECONDS
+READ_MAX_AGE_SECONDS = int(os.environ.get('READ_MAX_AGE_SECONDS', '5'))
+VERIFY_CACHE_TTL_SECONDS = float(os.environ.get('VERIFY_CACHE_TTL_SECONDS', '30'))
+if shared_store is not None:
+    data_version = SharedVersionCounter(shared_store)
+    verification_cache = SharedVerificationCache(shared_store, ttl=VERIFY_CACHE_TTL_SECONDS)
+else:
+    data_version = VersionCounter()
+    verification_cache = VerificationCache(
+        ttl=VERIFY_CACHE_TTL_SECONDS,
+        max_entries=int(os.environ.get('VERIFY_CACHE_MAX_ENTRIES', '10000')),
+    )
+stats_cache = {"version": None, "payload": None}
+
+# Opt-in profiling of /api/verify: send X-Debug-Profile: 1 with X-Admin-Token,
+# or sample a fraction of requests. Slow requests are kept for the admin endpoint.
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+profiler = Profiler(
+    admin_token=ADMIN_TOKEN,
+    sample_rate=float(os.environ.get('PROFILE_SAMPLE_RATE', '0')),
+    slow_threshold_ms=float(os.environ.get('SLOW_REQUEST_MS', '2000')),
+    capacity=int(os.environ.get('SLOW_REQUEST_BUFFER', '100')),
+)
+
 # Create the main app without a prefix
 app = FastAPI()
 
@@ -72,6 +166,10 @@ class VerificationStep(BaseModel):
     status: str  # "pending", "processing", "completed", "failed"
     result: Optional[str] = None
 
+class BatchVerifyRequest(BaseModel):
+    addresses: List[str]
+    priority: Literal["batch", "background"] = BATCH
+
 class WalletVerifyResponse(BaseModel):
     address: str
     is_valid: bool
@@ -106,13 +204,14 @@ DEMO_ADDRESSES = {
     }
 }
 
-def validate_solana_address(address: str) -> dict:
+def validate_solana_address(address: str, deadline: Optional[Deadline] = None) -> dict:
     """Real Solana wallet validation using on-chain data"""
     
     logger.info(f"Validating address: {address}")
     
     # Step 1: Pattern Analysis
-    pattern_valid = solana_service.validate_address_format(address)
+    with stage("validation"):
+        pattern_valid = solana_service.validate_address_format(address)
     
     if not pattern_valid:
         # Invalid address format
@@ -155,13 +254,14 @@ def validate_solana_address(address: str) -> dict:
     
     # Step 2: Fetch real on-chain data
     logger.info(f"Fetching on-chain data for {address}")
-    balance = solana_service.get_balance(address)
-    tx_count = solana_service.get_transaction_count(address)
+    balance = solana_service.get_balance(address, deadline)
+    tx_count = solana_service.get_transaction_count(address, deadline)
     
     logger.info(f"Balance: {balance} SOL, Transactions: {tx_count}")
     
     # Step 3: Risk analysis
-    risk = solana_service.analyze_risk(address, balance, tx_count)
+    with stage("risk_scoring"):
+        risk = solana_service.analyze_risk(address, balance, tx_count)
     
     # Build steps with real data
     steps = [
@@ -219,28 +319,205 @@ async def root():
     return {"message": "ARK Protocol API"}
 
 @api_router.post("/verify", response_model=WalletVerifyResponse)
-async def verify_wallet(request: WalletVerifyRequest):
+async def verify_wallet(request: WalletVerifyRequest, http_request: Request, response: Response):
     """Verify a Solana wallet address"""
-    result = validate_solana_address(request.address)
+    deadline = request_deadline(http_request)
+    entry = await run_until_done(
+        http_request,
+        deadline,
+        run_verification(request.address, INTERACTIVE, deadline),
+    )
+    await log_verifications([entry.result])
+    return verification_response(entry.result, response)
+
+@api_router.get("/verify/{address}", response_model=WalletVerifyResponse)
+async def verify_wallet_cacheable(address: str, http_request: Request, response: Response):
+    """Cacheable form of POST /verify, so CDNs and proxies can absorb hot addresses"""
+    entry = await verification_cache.get(address)
+    if entry is None:
+        # Only misses hit RPC, so only they are shed or charged the verify budget
+        if interactive_saturated():
+            raise HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "1"})
+        await charge_budget(http_request, verify_limit)
+        deadline = request_deadline(http_request)
+        entry = await run_until_done(
+            http_request,
+            deadline,
+            run_verification(address, INTERACTIVE, deadline),
+        )
+        # Cache hits and revalidations aren't new verifications
+        await log_verifications([entry.result])
     
-    # Log verification to database
-    log_entry = {
-        "id": str(uuid.uuid4()),
-        "address": request.address,
-        "risk_level": result["risk_level"],
-        "timestamp": datetime.now(timezone.utc).isoformat()
-    }
+    cache_control = f"public, max-age={entry.max_age()}"
+    if etag_matches(http_request, entry.etag):
+        return not_modified(entry.etag, cache_control)
     
-    if USE_MONGODB:
-        await db.verifications.insert_one(log_entry)
-    else:
-        in_memory_verifications.append(log_entry)
+    response.headers["ETag"] = entry.etag
+    response.headers["Cache-Control"] = cache_control
+    return verification_response(entry.result, response)
+
+@api_router.post("/verify/batch", response_model=List[WalletVerifyResponse])
+async def verify_wallets_batch(request: BatchVerifyRequest, http_request: Request):
+    """Verify many addresses at batch or background priority"""
+    if len(request.addresses) > MAX_BATCH_ADDRESSES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_ADDRESSES} addresses per batch")
+    if rpc_scheduler.queued(BATCH) + rpc_scheduler.queued(BACKGROUND) + len(request.addresses) > MAX_PENDING_BATCH_VERIFICATIONS:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "5"})
+    # One request per address, on top of the per-request verify budget
+    await charge_budget(http_request, batch_limit, len(request.addresses))
     
-    return result
+    # Batch work isn't request-scoped: one deadline can't fit up to
+    # MAX_BATCH_ADDRESSES verifications, and a 504 would throw away every
+    # completed result. It only stops early if the client disconnects.
+    deadline = Deadline(math.inf)
+    entries = await run_until_done(
+        http_request,
+        deadline,
+        asyncio.gather(
+            *(run_verification(address, request.priority, deadline) for address in request.addresses)
+        ),
+    )
+    results = [entry.result for entry in entries]
+    await log_verifications(results)
+    return results
+
+def interactive_saturated() -> bool:
+    return rpc_scheduler.queued(INTERACTIVE) >= MAX_PENDING_VERIFICATIONS
+
+async def charge_budget(http_request: Request, limit, cost: int = 1):
+    """Charge `cost` requests against `limit` for the client the rate limiter identified"""
+    client = getattr(http_request.state, "rate_limit_client", None)
+    if client is None or cost == 0:
+        # Rate limiting is disabled
+        return
+    allowed, retry_after = await charge(rate_limit_store, limit, client, cost)
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail="Rate limit exceeded",
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
+
+@api_router.get("/admin/slow-requests")
+async def get_slow_requests(http_request: Request):
+    """Get recently captured slow /api/verify requests, newest first"""
+    if not profiler.is_admin(http_request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
+    return {
+        "slow_threshold_ms": profiler.slow_threshold_ms,
+        "requests": list(reversed(profiler.slow_requests)),
+    }
+
+def verification_response(result: dict, response: Response):
+    """Return `result` for FastAPI to serialise, or pre-serialise it as a stage when profiling"""
+    if not profiling_active():
+        return result
+    with stage("serialization"):
+        body = WalletVerifyResponse(**result).model_dump_json()
+    return Response(body, media_type="application/json", headers=dict(response.headers))
+
+@api_router.get("/scheduler")
+async def get_scheduler_stats():
+    """Get per-priority-class queue depth and queue-time metrics"""
+    return {**rpc_scheduler.stats(), "verifications": verification_outcomes}
+
+def request_deadline(http_request: Request) -> Deadline:
+    """Build the request's deadline from X-Request-Timeout or the server default"""
+    header = http_request.headers.get("x-request-timeout")
+    if not header:
+        return Deadline(REQUEST_DEADLINE_SECONDS)
+    try:
+        timeout = float(header)
+    except ValueError:
+        timeout = 0
+    # NaN compares false with everything, so check finiteness explicitly
+    if not math.isfinite(timeout) or timeout <= 0:
+        raise HTTPException(status_code=400, detail="X-Request-Timeout must be a positive number of seconds")
+    return Deadline(min(timeout, MAX_REQUEST_DEADLINE_SECONDS))
+
+async def run_until_done(http_request: Request, deadline: Deadline, work):
+    """Await `work` unless the deadline passes or the client disconnects first"""
+    task = asyncio.ensure_future(work)
+    finished = False
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_INTERVAL, deadline.remaining()))
+            if done:
+                result = task.result()
+                finished = True
+                verification_outcomes["completed"] += 1
+                return result
+            if await http_request.is_disconnected():
+                verification_outcomes["abandoned"] += 1
+                raise HTTPException(status_code=499, detail="Client closed request")
+            if deadline.expired():
+                raise DeadlineExceeded()
+    except DeadlineExceeded:
+        verification_outcomes["deadline_exceeded"] += 1
+        raise HTTPException(status_code=504, detail="Verification deadline exceeded")
+    finally:
+        if not finished:
+            # Queued jobs are dropped; running ones stop at the next RPC boundary
+            deadline.cancel()
+            task.cancel()
+
+async def run_verification(address: str, priority: str, deadline: Optional[Deadline] = None) -> CachedVerification:
+    """Verify through the cache, running the RPC-backed check via the scheduler on a miss"""
+    entry = await verification_cache.get(address)
+    if entry is not None:
+        return entry
+    try:
+        # Covers queue wait plus the job; the RPC stages nest inside it
+        with stage("scheduled_verification"):
+            result = await rpc_scheduler.submit(validate_solana_address, address, deadline, priority=priority)
+        return await verification_cache.put(address, result)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Server is busy, please retry shortly", headers={"Retry-After": "1"})
+
+async def log_verifications(results: List[dict]):
+    """Log verification results to the database"""
+    now = datetime.now(timezone.utc)
+    log_entries = [
+        {
+            "id": str(uuid.uuid4()),
+            "address": result["address"],
+            "risk_level": result["risk_level"],
+            "timestamp": now.isoformat(),
+            # BSON date for the TTL index; the ISO string stays for readers
+            "created_at": now
+        }
+        for result in results
+    ]
+    if not log_entries:
+        return
+    
+    with stage("storage_write"):
+        if USE_MONGODB:
+            await db.verifications.insert_many(log_entries)
+        else:
+            in_memory_verifications.extend(log_entries)
+    await data_version.bump()
 
 @api_router.get("/stats")
-async def get_stats():
+async def get_stats(http_request: Request, response: Response):
     """Get verification statistics"""
+    # Read the version before computing so a concurrent write can only make
+    # the ETag look older than the body, never newer. TTL expiry doesn't bump
+    # the version; counts catch up on the next write.
+    version = await data_version.current()
+    etag = f'W/"stats-{data_version.epoch}-{version}"'
+    cache_control = f"public, max-age={READ_MAX_AGE_SECONDS}"
+    if etag_matches(http_request, etag):
+        return not_modified(etag, cache_control)
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    if stats_cache["version"] != version:
+        stats_cache["payload"] = await compute_stats()
+        stats_cache["version"] = version
+    return stats_cache["payload"]
+
+async def compute_stats() -> dict:
     if USE_MONGODB:
         total = await db.verifications.count_documents({})
         safe = await db.verifications.count_documents({"risk_level": "safe"})
@@ -265,17 +542,26 @@ async def create_status_check(input: StatusCheckCreate):
     status_obj = StatusCheck(**status_dict)
     
     doc = status_obj.model_dump()
+    doc['created_at'] = doc['timestamp']
     doc['timestamp'] = doc['timestamp'].isoformat()
     
     if USE_MONGODB:
         await db.status_checks.insert_one(doc)
     else:
         in_memory_status_checks.append(doc)
+    await data_version.bump()
     
     return status_obj
 
 @api_router.get("/status", response_model=List[StatusCheck])
-async def get_status_checks():
+async def get_status_checks(http_request: Request, response: Response):
+    etag = f'W/"status-{data_version.epoch}-{await data_version.current()}"'
+    cache_control = f"public, max-age={READ_MAX_AGE_SECONDS}"
+    if etag_matches(http_request, etag):
+        return not_modified(etag, cache_control)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    
     if USE_MONGODB:
         status_checks = await db.status_checks.find({}, {"_id": 0}).to_list(1000)
     else:
@@ -290,6 +576,21 @@ async def get_status_checks():
 # Include the router in the main app
 app.include_router(api_router)
 
+app.add_middleware(ProfilingMiddleware, profiler=profiler, paths=("/api/verify",))
+
+app.add_middleware(
+    RateLimitMiddleware,
+    store=rate_limit_store,
+    default_limit=limit_from_env('default', 300, 60),
+    expensive_limit=verify_limit,
+    # GET /api/verify/{address} charges verify_limit itself, on cache misses only
+    expensive_paths=("/api/verify", "/api/verify/batch"),
+    is_saturated=interactive_saturated,
+    api_keys=[key for key in os.environ.get('RATE_LIMIT_API_KEYS', '').split(',') if key],
+    proxy_hops=int(os.environ.get('RATE_LIMIT_PROXY_HOPS', '0')),
+    enabled=os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true',
+)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
@@ -313,7 +614,46 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc).isoformat()}
 
+archival_task = None
+index_task = None
+
+@app.on_event("startup")
+async def start_scheduler():
+    rpc_scheduler.start()
+
+@app.on_event("startup")
+async def warm_rpc_connections():
+    # Set by launcher.py so each worker opens its RPC pool before taking traffic
+    if os.environ.get('WARM_RPC_ON_STARTUP', 'false').lower() == 'true' and solana_service.snapshot is None:
+        await run_in_threadpool(solana_service.warm_up)
+
+@app.on_event("startup")
+async def start_history_maintenance():
+    global archival_task, index_task
+    if not HISTORY_MAINTENANCE:
+        return
+    if USE_MONGODB:
+        # Backfills and index builds on large collections can take a while;
+        # don't hold up startup (and health checks) for them
+        index_task = asyncio.create_task(index_maintenance(db, RETENTION_DAYS))
+    if ARCHIVE_AFTER_DAYS > 0:
+        memory_stores = None if USE_MONGODB else {
+            "verifications": in_memory_verifications,
+            "status_checks": in_memory_status_checks,
+        }
+        archival_task = asyncio.create_task(
+            archival_loop(
+                db, memory_stores, ARCHIVE_AFTER_DAYS, ARCHIVE_DIR, ARCHIVE_INTERVAL_HOURS * 3600,
+                on_change=data_version.bump,
+            )
+        )
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await rpc_scheduler.stop()
+    if archival_task:
+        archival_task.cancel()
+    if index_task:
+        index_task.cancel()
     if USE_MONGODB and client:
         client.close()
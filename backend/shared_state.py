@@ -0,0 +1,154 @@
+"""
+Cross-worker shared state over a local Unix socket.
+
+In multi-worker mode (see launcher.py) one state-server process owns the
+data version counter, the verification cache and the rate-limit buckets; workers
+talk to it through multiprocessing manager proxies. Each operation is a single
+round trip over the socket and runs atomically under the server's lock.
+
+Workers find the server through ARK_STATE_SOCKET / ARK_STATE_AUTHKEY, which
+the launcher sets before forking them.
+"""
+import os
+import time
+import signal
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from multiprocessing.managers import BaseManager
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from rate_limiter import InMemoryStore
+from http_cache import CachedVerification, content_etag
+
+logger = logging.getLogger(__name__)
+
+SOCKET_ENV = "ARK_STATE_SOCKET"
+AUTHKEY_ENV = "ARK_STATE_AUTHKEY"
+
+
+class StateStore:
+    """The state itself; lives in the state-server process only"""
+
+    def __init__(self, max_cache_entries: int = 10_000):
+        self._lock = threading.Lock()
+        self.epoch = secrets.token_hex(4)
+        self._counters: Dict[str, int] = {}
+        self._cache: "OrderedDict[str, Tuple]" = OrderedDict()
+        self._max_cache_entries = max_cache_entries
+        # InMemoryStore has its own lock, so GCRA is atomic across workers too
+        self._buckets = InMemoryStore()
+
+    def incr(self, name: str, amount: int = 1) -> int:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+            return self._counters[name]
+
+    def get(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def get_epoch(self) -> str:
+        return self.epoch
+
+    def cache_get(self, key: str) -> Optional[Tuple]:
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is None:
+                return None
+            if entry[2] <= time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return entry
+
+    def cache_put(self, key: str, entry: Tuple):
+        with self._lock:
+            self._cache[key] = entry
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._max_cache_entries:
+                self._cache.popitem(last=False)
+
+    def gcra_acquire(self, key: str, now: float, interval: float, tolerance: float) -> Tuple[bool, float]:
+        return self._buckets.consume(key, now, interval, tolerance)
+
+
+_store: Optional[StateStore] = None
+
+
+def _get_store() -> StateStore:
+    global _store
+    if _store is None:
+        _store = StateStore(int(os.environ.get('VERIFY_CACHE_MAX_ENTRIES', '10000')))
+    return _store
+
+
+class StateManager(BaseManager):
+    pass
+
+
+StateManager.register("get_store", callable=_get_store)
+
+
+def start_state_server(socket_path: str, authkey: bytes) -> StateManager:
+    """Start the state-server process listening on `socket_path`"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    manager = StateManager(address=socket_path, authkey=authkey)
+    # Ctrl+C reaches the whole process group; the launcher shuts this down last
+    manager.start(initializer=signal.signal, initargs=(signal.SIGINT, signal.SIG_IGN))
+    logger.info(f"Shared state server listening on {socket_path}")
+    return manager
+
+
+def connect_from_env():
+    """Proxy to the shared StateStore when running under the launcher, else None"""
+    socket_path = os.environ.get(SOCKET_ENV, "")
+    if not socket_path:
+        return None
+    manager = StateManager(address=socket_path, authkey=bytes.fromhex(os.environ[AUTHKEY_ENV]))
+    manager.connect()
+    logger.info(f"Connected to shared state at {socket_path}")
+    return manager.get_store()
+
+
+# Adapters giving the shared store the same interface as the per-process objects.
+# Proxy calls block on the socket, so they run in the threadpool, off the event loop.
+
+class SharedRateLimitStore:
+    def __init__(self, store):
+        self.store = store
+
+    async def acquire(self, key: str, now: float, interval: float, tolerance: float) -> Tuple[bool, float]:
+        return await run_in_threadpool(self.store.gcra_acquire, key, now, interval, tolerance)
+
+
+class SharedVersionCounter:
+    def __init__(self, store, name: str = "data_version"):
+        self.store = store
+        self.name = name
+        # One epoch per state server, i.e. per launcher boot, shared by all workers
+        self.epoch = store.get_epoch()
+
+    async def current(self) -> int:
+        return await run_in_threadpool(self.store.get, self.name)
+
+    async def bump(self) -> int:
+        return await run_in_threadpool(self.store.incr, self.name)
+
+
+class SharedVerificationCache:
+    def __init__(self, store, ttl: float = 30.0):
+        self.store = store
+        self.ttl = ttl
+
+    async def get(self, address: str) -> Optional[CachedVerification]:
+        entry = await run_in_threadpool(self.store.cache_get, address)
+        return CachedVerification(*entry) if entry is not None else None
+
+    async def put(self, address: str, result: Dict) -> CachedVerification:
+        entry = CachedVerification(result, content_etag(result), time.time() + self.ttl)
+        await run_in_threadpool(self.store.cache_put, address, (entry.result, entry.etag, entry.expires_at))
+        return entry
@@ -0,0 +1,102 @@
+"""
+Offline account snapshots for network-free verification.
+
+A snapshot is a directory of memory-mapped NumPy arrays, row-aligned and
+sorted by address:
+
+    addresses.npy   base58 addresses (S44)
+    lamports.npy    balance in lamports (uint64)
+    tx_counts.npy   signature count (uint32)
+    manifest.json   slot, creation time and row count
+
+It is produced by the export step (`python snapshot.py build`) and lets
+SolanaService answer get_balance / get_transaction_count at memory speed.
+"""
+import os
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ADDRESS_DTYPE = "S44"  # base58 Solana addresses are 32-44 characters
+
+
+class SnapshotSource:
+    """Read-only lookups into a snapshot directory; pages are loaded on demand"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.addresses = np.load(self.path / "addresses.npy", mmap_mode="r")
+        self.lamports = np.load(self.path / "lamports.npy", mmap_mode="r")
+        self.tx_counts = np.load(self.path / "tx_counts.npy", mmap_mode="r")
+        self.manifest: Dict = json.loads((self.path / "manifest.json").read_text())
+        logger.info(f"Loaded snapshot {self.path} with {len(self.addresses)} accounts at slot {self.manifest.get('slot')}")
+
+    def _row(self, address: str) -> Optional[int]:
+        key = address.encode()
+        i = int(np.searchsorted(self.addresses, key))
+        if i < len(self.addresses) and self.addresses[i] == key:
+            return i
+        return None
+
+    def get_lamports(self, address: str) -> int:
+        """Balance in lamports; accounts missing from the snapshot hold nothing"""
+        row = self._row(address)
+        return 0 if row is None else int(self.lamports[row])
+
+    def get_transaction_count(self, address: str) -> int:
+        row = self._row(address)
+        return 0 if row is None else int(self.tx_counts[row])
+
+
+def build_snapshot(df, path, slot: Optional[int] = None) -> int:
+    """Write a snapshot from a DataFrame with address, lamports and tx_count columns"""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    df = df.drop_duplicates("address", keep="last").sort_values("address")
+
+    np.save(path / "addresses.npy", df["address"].to_numpy(dtype=ADDRESS_DTYPE))
+    np.save(path / "lamports.npy", df["lamports"].to_numpy(dtype=np.uint64))
+    np.save(path / "tx_counts.npy", df["tx_count"].to_numpy(dtype=np.uint32))
+    (path / "manifest.json").write_text(json.dumps({
+        "slot": slot,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "accounts": len(df),
+    }))
+    return len(df)
+
+
+if __name__ == "__main__":
+    import typer
+    import pandas as pd
+    from collections import Counter
+    from solana_service import SolanaService
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    cli = typer.Typer(help="Offline account snapshot tools")
+
+    @cli.command()
+    def build(csv_path: Path, out_dir: Path, slot: Optional[int] = None):
+        """Build a snapshot from a CSV export with address,lamports,tx_count columns"""
+        df = pd.read_csv(csv_path, dtype={"address": str, "lamports": "uint64", "tx_count": "uint32"})
+        print(f"Wrote {build_snapshot(df, out_dir, slot)} accounts to {out_dir}")
+
+    @cli.command()
+    def backtest(snapshot_dir: Path):
+        """Score every address in a snapshot with the live risk rules"""
+        service = SolanaService(os.environ.get('SOLANA_RPC_URL', 'https://api.mainnet-beta.solana.com'),
+                                snapshot=SnapshotSource(snapshot_dir))
+        counts = Counter()
+        for raw in service.snapshot.addresses:
+            address = raw.decode()
+            balance = service.get_balance(address)
+            tx_count = service.get_transaction_count(address)
+            counts[service.analyze_risk(address, balance, tx_count)] += 1
+        print(dict(counts))
+
+    cli()
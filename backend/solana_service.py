@@ -3,19 +3,94 @@ Solana blockchain service for real wallet verification
 """
 import os
 import logging
+import threading
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict, List
+import httpx
 from solana.rpc.api import Client
+from solana.rpc.providers.http import HTTPProvider
+from solana.rpc.providers.core import _after_request_unparsed
 from solders.pubkey import Pubkey
 import base58
+from deadline import Deadline, DeadlineExceeded, check_deadline
+from profiling import stage
+from snapshot import SnapshotSource
 
 logger = logging.getLogger(__name__)
 
+class PooledHTTPProvider(HTTPProvider):
+    """
+    HTTPProvider that reuses keep-alive connections instead of opening one per call.
+
+    solana-py has no public hook for passing an httpx.Client, so this overrides
+    the provider's request methods; requirements.txt pins the version it targets.
+    Inside `bounded_by(deadline)` each call's timeout is capped at the time the
+    deadline has left, so abandoned requests don't hold RPC connections.
+    """
+    
+    def __init__(self, endpoint: str, timeout: float = 10, max_connections: int = 16):
+        super().__init__(endpoint, timeout=timeout)
+        self.session = httpx.Client(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        # Calls run on scheduler worker threads, one request per thread at a time
+        self._local = threading.local()
+    
+    @contextlib.contextmanager
+    def bounded_by(self, deadline: Optional[Deadline]):
+        previous = getattr(self._local, "deadline", None)
+        self._local.deadline = deadline
+        try:
+            yield
+        finally:
+            self._local.deadline = previous
+    
+    def _call_timeout(self) -> float:
+        deadline = getattr(self._local, "deadline", None)
+        if deadline is None:
+            return self.timeout
+        # Raises DeadlineExceeded rather than sending with no time left
+        deadline.check()
+        return min(self.timeout, deadline.remaining())
+    
+    def make_request_unparsed(self, body) -> str:
+        return _after_request_unparsed(self.session.post(**self._before_request(body=body), timeout=self._call_timeout()))
+    
+    def make_batch_request_unparsed(self, reqs) -> str:
+        return _after_request_unparsed(self.session.post(**self._before_batch_request(reqs), timeout=self._call_timeout()))
+
 class SolanaService:
-    def __init__(self, rpc_url: str):
+    def __init__(self, rpc_url: str, snapshot: Optional[SnapshotSource] = None, max_connections: int = 16):
         self.rpc_url = rpc_url
         self.client = Client(rpc_url, timeout=10)  # 10 second timeout
+        # The stock provider opens a new connection (and TLS handshake) per request
+        self.provider = PooledHTTPProvider(rpc_url, timeout=10, max_connections=max_connections)
+        self.client._provider = self.provider
+        self.max_connections = max_connections
+        # When set, balances and transaction counts come from the offline
+        # snapshot instead of RPC; other lookups still go to the RPC node
+        self.snapshot = snapshot
         logger.info(f"Initialized Solana RPC client: {rpc_url}")
     
+    def warm_up(self, connections: Optional[int] = None) -> int:
+        """Open keep-alive RPC connections ahead of traffic; returns how many succeeded"""
+        connections = connections or self.max_connections
+        
+        def ping(_):
+            try:
+                self.client.get_slot()
+                return True
+            except Exception as e:
+                logger.warning(f"RPC warm-up request failed: {e}")
+                return False
+        
+        # Concurrent requests force the pool to open `connections` sockets
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            warmed = sum(pool.map(ping, range(connections)))
+        logger.info(f"Warmed {warmed}/{connections} RPC connections")
+        return warmed
+    
     def validate_address_format(self, address: str) -> bool:
         """Validate if address is a valid Solana public key"""
         try:
@@ -24,21 +99,31 @@ class SolanaService:
         except Exception:
             return False
     
-    def get_balance(self, address: str) -> Optional[float]:
+    def get_balance(self, address: str, deadline: Optional[Deadline] = None) -> Optional[float]:
         """Get SOL balance for an address"""
+        check_deadline(deadline)
         try:
-            pubkey = Pubkey.from_string(address)
-            response = self.client.get_balance(pubkey)
+            if self.snapshot is not None:
+                lamports = self.snapshot.get_lamports(address)
+            else:
+                pubkey = Pubkey.from_string(address)
+                with stage("rpc.get_balance"), self.provider.bounded_by(deadline):
+                    lamports = self.client.get_balance(pubkey).value
             
-            if response.value is not None:
+            if lamports is not None:
                 # Convert lamports to SOL (1 SOL = 1,000,000,000 lamports)
-                balance_sol = response.value / 1_000_000_000
+                balance_sol = lamports / 1_000_000_000
                 return round(balance_sol, 4)
         except Exception as e:
+            # A timeout cut short by the deadline is the deadline's error
+            check_deadline(deadline)
             logger.error(f"Error fetching balance for {address}: {e}")
     
-    def get_transaction_count(self, address: str) -> int:
+    def get_transaction_count(self, address: str, deadline: Optional[Deadline] = None) -> int:
         """Get real transaction count using Solana RPC with pagination"""
+        check_deadline(deadline)
+        if self.snapshot is not None:
+            return self.snapshot.get_transaction_count(address)
         try:
             pubkey = Pubkey.from_string(address)
             
@@ -47,16 +132,19 @@ class SolanaService:
             before_signature = None
             max_iterations = 10  # Prevent infinite loops
             
-            for _ in range(max_iterations):
+            for page in range(max_iterations):
+                # Stop paginating as soon as nobody is waiting for the answer
+                check_deadline(deadline)
                 try:
-                    if before_signature:
-                        response = self.client.get_signatures_for_address(
-                            pubkey, 
-                            limit=100, 
-                            before=before_signature
-                        )
-                    else:
-                        response = self.client.get_signatures_for_address(pubkey, limit=100)
+                    with stage(f"rpc.get_signatures_for_address[{page}]"), self.provider.bounded_by(deadline):
+                        if before_signature:
+                            response = self.client.get_signatures_for_address(
+                                pubkey, 
+                                limit=100, 
+                                before=before_signature
+                            )
+                        else:
+                            response = self.client.get_signatures_for_address(pubkey, limit=100)
                     
                     if hasattr(response, 'value') and response.value:
                         batch_count = len(response.value)
@@ -70,25 +158,30 @@ class SolanaService:
                         break
                         
                 except Exception as e:
+                    check_deadline(deadline)
                     logger.warning(f"Batch failed: {e}")
                     break
             
             return total_count
             
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error fetching transactions for {address}: {e}")
             return 0
     
-    def get_token_accounts(self, address: str) -> List[Dict]:
+    def get_token_accounts(self, address: str, deadline: Optional[Deadline] = None) -> List[Dict]:
         """Get SPL token accounts for an address"""
+        check_deadline(deadline)
         try:
             pubkey = Pubkey.from_string(address)
             
             # Get token accounts by owner
-            response = self.client.get_token_accounts_by_owner(
-                pubkey,
-                {"programId": Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")}
-            )
+            with self.provider.bounded_by(deadline):
+                response = self.client.get_token_accounts_by_owner(
+                    pubkey,
+                    {"programId": Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")}
+                )
             
             tokens = []
             if hasattr(response, 'value') and response.value:
@@ -147,11 +240,13 @@ class SolanaService:
                 return 'safe'
             return 'risky'
     
-    def get_recent_activity(self, address: str, limit: int = 10) -> List[Dict]:
+    def get_recent_activity(self, address: str, limit: int = 10, deadline: Optional[Deadline] = None) -> List[Dict]:
         """Get recent transaction activity"""
+        check_deadline(deadline)
         try:
             pubkey = Pubkey.from_string(address)
-            response = self.client.get_signatures_for_address(pubkey, limit=limit)
+            with self.provider.bounded_by(deadline):
+                response = self.client.get_signatures_for_address(pubkey, limit=limit)
             
             activities = []
             if hasattr(response, 'value') and response.value:
@@ -168,7 +263,7 @@ class SolanaService:
             logger.error(f"Error fetching recent activity for {address}: {e}")
             return []
     
-    def verify_wallet(self, address: str) -> Dict:
+    def verify_wallet(self, address: str, deadline: Optional[Deadline] = None) -> Dict:
         """
         Complete wallet verification with real on-chain data
         """
@@ -186,15 +281,15 @@ class SolanaService:
             }
         
         # Step 2: Fetch on-chain data
-        balance = self.get_balance(address)
-        tx_count = self.get_transaction_count(address)
+        balance = self.get_balance(address, deadline)
+        tx_count = self.get_transaction_count(address, deadline)
         
         # Step 3: Analyze risk
         risk_level = self.analyze_risk(address, balance, tx_count)
         
         # Step 4: Get additional data
-        token_accounts = self.get_token_accounts(address)
-        recent_activity = self.get_recent_activity(address, limit=5)
+        token_accounts = self.get_token_accounts(address, deadline)
+        recent_activity = self.get_recent_activity(address, limit=5, deadline=deadline)
         
         return {
             'is_valid': True,
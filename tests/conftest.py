@@ -0,0 +1,70 @@
+import sys
+import time
+import importlib
+from pathlib import Path
+
+import pytest
+from starlette.testclient import TestClient
+
+# Backend modules import each other as top-level modules (uvicorn runs from backend/)
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+# server.py reads its configuration at import time; these keep it offline,
+# in-memory and single-process unless a test overrides them
+SERVER_ENV = {
+    "MONGO_URL": "",
+    "SOLANA_RPC_URL": "http://127.0.0.1:9",
+    "SOLANA_SNAPSHOT_PATH": "",
+    "ARK_STATE_SOCKET": "",
+    "ARCHIVE_AFTER_DAYS": "0",
+    "WARM_RPC_ON_STARTUP": "false",
+    "ADMIN_TOKEN": "",
+    "PROFILE_SAMPLE_RATE": "0",
+}
+
+
+def fake_verification(address, deadline=None):
+    """Stand-in for validate_solana_address: no RPC, and "slow" addresses take a second"""
+    if address.startswith("slow"):
+        for _ in range(100):
+            deadline.check()
+            time.sleep(0.01)
+    valid = not address.startswith("bad")
+    return {
+        "address": address,
+        "is_valid": valid,
+        "risk_level": "safe" if valid else "invalid",
+        "steps": [],
+        "summary": "",
+        "balance": 1.0 if valid else None,
+        "transaction_count": 10,
+    }
+
+
+@pytest.fixture
+def make_server(monkeypatch):
+    """
+    Import a fresh server module with `env` overrides; returns (server, TestClient).
+    Verification is faked unless `verify=None` is passed.
+    """
+    clients = []
+
+    def make(verify=fake_verification, **env):
+        # Reloading replaces the module globals the previous app's shutdown hooks use
+        while clients:
+            clients.pop().__exit__(None, None, None)
+        for name, value in {**SERVER_ENV, **env}.items():
+            monkeypatch.setenv(name, str(value))
+        import server
+        server = importlib.reload(server)
+        if verify is not None:
+            monkeypatch.setattr(server, "validate_solana_address", verify)
+        client = TestClient(server.app)
+        client.__enter__()
+        clients.append(client)
+        return server, client
+
+    yield make
+    for client in clients:
+        client.__exit__(None, None, None)
+
@@ -0,0 +1,147 @@
+import math
+import asyncio
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from fastapi import HTTPException
+
+from deadline import Deadline, DeadlineExceeded, check_deadline
+from solana_service import SolanaService
+
+
+def test_deadline_expires():
+    deadline = Deadline(0.05)
+    assert not deadline.expired()
+    assert 0 < deadline.remaining() <= 0.05
+    deadline.check()
+
+    time.sleep(0.06)
+    assert deadline.expired()
+    assert deadline.remaining() == 0.0
+    with pytest.raises(DeadlineExceeded, match="exceeded"):
+        deadline.check()
+
+
+def test_cancel_stops_work_before_expiry():
+    deadline = Deadline(60)
+    deadline.cancel()
+
+    assert deadline.cancelled
+    assert not deadline.expired()
+    with pytest.raises(DeadlineExceeded, match="abandoned"):
+        deadline.check()
+
+
+def test_infinite_deadline_only_ends_on_cancel():
+    deadline = Deadline(math.inf)
+    assert not deadline.expired()
+    assert deadline.remaining() == math.inf
+    deadline.check()
+
+    deadline.cancel()
+    with pytest.raises(DeadlineExceeded):
+        check_deadline(deadline)
+
+
+def test_check_deadline_allows_none():
+    check_deadline(None)
+
+
+@pytest.fixture
+def slow_rpc():
+    """A JSON-RPC endpoint that takes two seconds to answer"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            time.sleep(2)
+            self.send_response(200)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+ADDRESS = "So11111111111111111111111111111111111111112"
+
+
+def test_rpc_calls_stop_at_the_deadline(slow_rpc):
+    service = SolanaService(slow_rpc)
+
+    for call in (service.get_balance, service.get_transaction_count):
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            call(ADDRESS, Deadline(0.3))
+        assert time.monotonic() - started < 1.0
+
+
+def test_cancelled_deadline_stops_before_sending(slow_rpc):
+    service = SolanaService(slow_rpc)
+    deadline = Deadline(60)
+    deadline.cancel()
+
+    started = time.monotonic()
+    with pytest.raises(DeadlineExceeded, match="abandoned"):
+        service.get_balance(ADDRESS, deadline)
+    assert time.monotonic() - started < 0.1
+
+
+def test_verify_returns_504_at_the_request_deadline(make_server):
+    _, client = make_server()
+
+    started = time.monotonic()
+    response = client.post("/api/verify", json={"address": "slow1"}, headers={"X-Request-Timeout": "0.3"})
+
+    assert response.status_code == 504
+    assert time.monotonic() - started < 0.9
+    assert client.get("/api/scheduler").json()["verifications"]["deadline_exceeded"] == 1
+
+
+@pytest.mark.parametrize("timeout", ["nan", "inf", "-1", "0", "abc"])
+def test_invalid_request_timeouts_rejected(make_server, timeout):
+    _, client = make_server()
+
+    response = client.post("/api/verify", json={"address": "addr"}, headers={"X-Request-Timeout": timeout})
+
+    assert response.status_code == 400
+
+
+def test_batch_ignores_request_deadline(make_server):
+    _, client = make_server()
+
+    response = client.post(
+        "/api/verify/batch", json={"addresses": ["slow1", "slow2"]}, headers={"X-Request-Timeout": "0.3"}
+    )
+
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+
+def test_disconnected_client_gets_499_and_work_is_cancelled(make_server):
+    server, _ = make_server()
+
+    class DisconnectedRequest:
+        async def is_disconnected(self):
+            return True
+
+    async def run():
+        deadline = Deadline(60)
+        work = asyncio.ensure_future(asyncio.sleep(60))
+        with pytest.raises(HTTPException) as error:
+            await server.run_until_done(DisconnectedRequest(), deadline, work)
+        await asyncio.sleep(0)
+        return error.value, deadline, work
+
+    error, deadline, work = asyncio.run(run())
+
+    assert error.status_code == 499
+    assert deadline.cancelled
+    assert work.cancelled()
+    assert server.verification_outcomes["abandoned"] == 1
@@ -0,0 +1,114 @@
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+
+from history_archive import (
+    archive_records,
+    backfill_created_at,
+    daily_risk_summary,
+    index_maintenance,
+    load_archive,
+    write_archive,
+)
+
+
+class FailingDatabase:
+    def __getitem__(self, name):
+        raise ConnectionError("MongoDB unavailable")
+
+
+def test_index_maintenance_logs_failures(caplog):
+    with caplog.at_level(logging.ERROR, logger="history_archive"):
+        asyncio.run(index_maintenance(FailingDatabase(), {"verifications": 30}))
+
+    assert "Index maintenance failed: MongoDB unavailable" in caplog.text
+
+
+def record(i, days_ago, risk_level="safe"):
+    timestamp = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return {"id": f"r{i}", "address": f"addr{i}", "risk_level": risk_level, "timestamp": timestamp.isoformat()}
+
+
+def test_archive_records_moves_only_aged_records(tmp_path):
+    records = [record(0, 10), record(1, 9, "risky"), record(2, 0)]
+    cutoff = datetime.now(timezone.utc) - timedelta(days=1)
+
+    archived = asyncio.run(archive_records("verifications", records, cutoff, tmp_path))
+
+    assert archived == 2
+    assert [r["id"] for r in records] == ["r2"]
+    assert len(list((tmp_path / "verifications").glob("date=*/part-*.parquet"))) == 2
+
+
+def test_load_archive_reads_only_requested_days(tmp_path):
+    write_archive("verifications", [record(0, 10), record(1, 9, "risky"), record(2, 2)], tmp_path)
+    nine_days_ago = (datetime.now(timezone.utc) - timedelta(days=9)).date()
+
+    recent = load_archive("verifications", start=nine_days_ago, archive_dir=tmp_path)
+    everything = load_archive("verifications", archive_dir=tmp_path)
+
+    assert sorted(recent["id"]) == ["r1", "r2"]
+    assert len(everything) == 3
+    assert load_archive("status_checks", archive_dir=tmp_path).empty
+
+
+def test_daily_risk_summary_counts_per_day(tmp_path):
+    write_archive("verifications", [record(0, 3), record(1, 3, "risky"), record(2, 3, "risky")], tmp_path)
+
+    summary = daily_risk_summary(archive_dir=tmp_path)
+
+    assert summary.iloc[0].to_dict() == {"risky": 2, "safe": 1}
+
+
+class FakeCollection:
+    """Just enough of a Motor collection for backfill_created_at"""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection):
+        docs = [d for d in self.docs if "created_at" not in d]
+
+        class Cursor:
+            async def to_list(self, length):
+                return docs[:length]
+
+        return Cursor()
+
+    async def bulk_write(self, updates, ordered=True):
+        by_id = {d["_id"]: d for d in self.docs}
+        for update in updates:
+            by_id[update._filter["_id"]].update(update._doc["$set"])
+
+
+def test_backfill_created_at_from_timestamp():
+    created = datetime(2025, 1, 2, 3, 4, 5, 123456, tzinfo=timezone.utc)
+    docs = [
+        {"_id": 1, "timestamp": created.isoformat()},
+        {"_id": 2, "timestamp": "not a date"},
+        {"_id": 3, "timestamp": created.isoformat(), "created_at": created - timedelta(days=1)},
+    ]
+
+    backfilled = asyncio.run(backfill_created_at({"verifications": FakeCollection(docs)}, "verifications"))
+
+    assert backfilled == 2
+    assert docs[0]["created_at"] == created
+    # Unparseable records start ageing now
+    assert datetime.now(timezone.utc) - docs[1]["created_at"] < timedelta(minutes=1)
+    assert docs[2]["created_at"] == created - timedelta(days=1)
+
+
+def test_archival_loop_archives_in_memory_history(make_server, tmp_path):
+    server, client = make_server(ARCHIVE_AFTER_DAYS=1, ARCHIVE_INTERVAL_HOURS=0.0001, ARCHIVE_DIR=tmp_path)
+    client.post("/api/verify", json={"address": "addr"})
+    assert client.get("/api/stats").json()["total_verifications"] == 1
+
+    server.in_memory_verifications[0]["timestamp"] = record(0, 5)["timestamp"]
+    deadline = time.monotonic() + 5
+    while server.in_memory_verifications and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    # Archiving bumps the data version, so the memoised stats are recomputed
+    assert client.get("/api/stats").json()["total_verifications"] == 0
+    assert list(load_archive("verifications", archive_dir=tmp_path)["address"]) == ["addr"]
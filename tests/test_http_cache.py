@@ -0,0 +1,141 @@
+import asyncio
+
+from starlette.requests import Request
+
+from tests.conftest import fake_verification
+from http_cache import VersionCounter, VerificationCache, content_etag, etag_matches
+
+
+def request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "headers": headers})
+
+
+def test_etag_matches_exact_and_list():
+    assert etag_matches(request('"abc"'), '"abc"')
+    assert etag_matches(request('"x", "abc" ,"y"'), '"abc"')
+    assert not etag_matches(request('"abcd"'), '"abc"')
+    assert not etag_matches(request(), '"abc"')
+
+
+def test_etag_matches_uses_weak_comparison():
+    assert etag_matches(request('W/"stats-1"'), 'W/"stats-1"')
+    assert etag_matches(request('"stats-1"'), 'W/"stats-1"')
+    assert etag_matches(request('W/"abc"'), '"abc"')
+
+
+def test_etag_matches_wildcard():
+    assert etag_matches(request("*"), '"anything"')
+
+
+def test_content_etag_is_stable_and_content_addressed():
+    assert content_etag({"a": 1, "b": 2}) == content_etag({"b": 2, "a": 1})
+    assert content_etag({"a": 1}) != content_etag({"a": 2})
+
+
+def test_version_counter_epoch_differs_per_instance():
+    first, second = VersionCounter(), VersionCounter()
+    assert first.epoch != second.epoch
+    assert asyncio.run(first.bump()) == 1
+    assert asyncio.run(first.current()) == 1
+
+
+def test_verification_cache_evicts_least_recently_used():
+    cache = VerificationCache(ttl=60, max_entries=2)
+
+    async def run():
+        await cache.put("a", {"address": "a"})
+        await cache.put("b", {"address": "b"})
+        # Reading "a" makes "b" the least recently used
+        assert await cache.get("a") is not None
+        await cache.put("c", {"address": "c"})
+        return [await cache.get(key) is not None for key in ("a", "b", "c")]
+
+    assert asyncio.run(run()) == [True, False, True]
+
+
+def test_verification_cache_expires_entries():
+    cache = VerificationCache(ttl=0)
+
+    async def run():
+        entry = await cache.put("a", {"address": "a"})
+        return entry, await cache.get("a")
+
+    entry, cached = asyncio.run(run())
+    assert entry.etag == content_etag({"address": "a"})
+    assert entry.max_age() == 0
+    assert cached is None
+
+
+def test_cached_get_verify_is_not_charged_the_verify_budget(make_server):
+    _, client = make_server(RATE_LIMIT_VERIFY_PER_MINUTE=2, RATE_LIMIT_VERIFY_BURST=2)
+
+    assert {client.get("/api/verify/hot").status_code for _ in range(10)} == {200}
+    # Misses still draw on the verify budget (one was spent on "hot")
+    assert [client.get(f"/api/verify/cold{i}").status_code for i in range(2)] == [200, 429]
+
+
+def test_cached_get_verify_is_served_while_saturated(make_server):
+    server, client = make_server(MAX_PENDING_VERIFICATIONS=0)
+    asyncio.run(server.verification_cache.put("hot", fake_verification("hot")))
+
+    assert client.get("/api/verify/hot").status_code == 200
+    assert client.get("/api/verify/cold").status_code == 503
+
+
+def test_get_verify_revalidates_with_304(make_server):
+    _, client = make_server()
+
+    first = client.get("/api/verify/addr")
+    revalidated = client.get("/api/verify/addr", headers={"If-None-Match": first.headers["etag"]})
+
+    assert first.status_code == 200
+    assert first.headers["cache-control"].startswith("public, max-age=")
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == first.headers["etag"]
+    assert revalidated.content == b""
+
+
+def test_cache_hits_are_not_logged(make_server):
+    _, client = make_server()
+
+    for _ in range(3):
+        client.get("/api/verify/addr")
+
+    assert client.get("/api/stats").json()["total_verifications"] == 1
+
+
+def test_stats_etag_changes_on_write(make_server):
+    _, client = make_server()
+
+    first = client.get("/api/stats")
+    assert client.get("/api/stats", headers={"If-None-Match": first.headers["etag"]}).status_code == 304
+
+    client.post("/api/verify", json={"address": "addr"})
+    second = client.get("/api/stats", headers={"If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()["total_verifications"] == 1
+
+
+def test_status_etag_changes_on_write(make_server):
+    _, client = make_server()
+
+    first = client.get("/api/status")
+    client.post("/api/status", json={"client_name": "probe"})
+    second = client.get("/api/status", headers={"If-None-Match": first.headers["etag"]})
+
+    assert second.status_code == 200
+    assert [check["client_name"] for check in second.json()] == ["probe"]
+    assert client.get("/api/status", headers={"If-None-Match": second.headers["etag"]}).status_code == 304
+
+
+def test_etags_do_not_survive_a_restart(make_server):
+    _, before = make_server()
+    etag = before.get("/api/stats").headers["etag"]
+
+    _, after = make_server()
+
+    # The counter restarts at 0, but the boot epoch differs
+    assert after.get("/api/stats", headers={"If-None-Match": etag}).status_code == 200
@@ -0,0 +1,61 @@
+from profiling import Profiler, profiling_active, stage
+
+ADMIN = {"X-Admin-Token": "secret"}
+
+
+def test_stage_is_a_shared_no_op_outside_profiled_requests():
+    assert not profiling_active()
+    assert stage("a") is stage("b")
+    with stage("a"):
+        pass
+
+
+def test_is_admin():
+    assert Profiler(admin_token="secret").is_admin("secret")
+    assert not Profiler(admin_token="secret").is_admin("wrong")
+    assert not Profiler(admin_token="secret").is_admin(None)
+    # No token configured means nobody is an admin
+    assert not Profiler().is_admin("")
+
+
+def test_server_timing_for_admin_profile_requests(make_server):
+    _, client = make_server(ADMIN_TOKEN="secret")
+
+    response = client.post("/api/verify", json={"address": "addr"}, headers={"X-Debug-Profile": "1", **ADMIN})
+
+    assert response.status_code == 200
+    assert response.json()["address"] == "addr"
+    timing = response.headers["server-timing"]
+    for name in ("scheduled_verification", "storage_write", "serialization"):
+        assert f'desc="{name}"' in timing
+    assert "total;dur=" in timing
+
+
+def test_no_server_timing_without_valid_admin_token(make_server):
+    _, client = make_server(ADMIN_TOKEN="secret")
+
+    for headers in ({"X-Debug-Profile": "1"}, {"X-Debug-Profile": "1", "X-Admin-Token": "wrong"}, ADMIN):
+        response = client.post("/api/verify", json={"address": "addr"}, headers=headers)
+        assert response.status_code == 200
+        assert "server-timing" not in response.headers
+
+
+def test_slow_requests_captured_for_admins(make_server):
+    _, client = make_server(ADMIN_TOKEN="secret", SLOW_REQUEST_MS=0)
+    client.post("/api/verify", json={"address": "addr"}, headers={"X-Debug-Profile": "1", **ADMIN})
+    client.get("/api/verify/other")
+
+    assert client.get("/api/admin/slow-requests").status_code == 403
+    assert client.get("/api/admin/slow-requests", headers={"X-Admin-Token": "wrong"}).status_code == 403
+
+    captured = client.get("/api/admin/slow-requests", headers=ADMIN).json()["requests"]
+    # Newest first; only the profiled request has a stage breakdown
+    assert [(r["method"], r["path"]) for r in captured] == [("GET", "/api/verify/other"), ("POST", "/api/verify")]
+    assert captured[0]["stages"] is None
+    assert "scheduled_verification" in [s["name"] for s in captured[1]["stages"]]
+
+
+def test_slow_requests_disabled_without_admin_token(make_server):
+    _, client = make_server()
+
+    assert client.get("/api/admin/slow-requests").status_code == 403
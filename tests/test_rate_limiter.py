@@ -0,0 +1,158 @@
+import asyncio
+
+from starlette.responses import PlainTextResponse
+from starlette.testclient import TestClient
+
+from rate_limiter import InMemoryStore, RateLimit, RateLimitMiddleware, charge
+
+
+def test_gcra_allows_burst_then_spaces_requests():
+    limit = RateLimit("verify", rate=60, period=60.0, burst=3)
+    store = InMemoryStore()
+    now = 1000.0
+
+    results = [store.consume("c", now, limit.emission_interval, limit.tolerance) for _ in range(4)]
+
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] == 1.0
+    # One emission interval later exactly one more request fits
+    assert store.consume("c", now + 1.0, limit.emission_interval, limit.tolerance) == (True, 0.0)
+    assert not store.consume("c", now + 1.0, limit.emission_interval, limit.tolerance)[0]
+
+
+def test_gcra_rejections_do_not_consume_budget():
+    limit = RateLimit("verify", rate=60, period=60.0, burst=1)
+    store = InMemoryStore()
+
+    assert store.consume("c", 0.0, limit.emission_interval, limit.tolerance)[0]
+    for _ in range(5):
+        assert not store.consume("c", 0.5, limit.emission_interval, limit.tolerance)[0]
+    assert store.consume("c", 1.0, limit.emission_interval, limit.tolerance)[0]
+
+
+def test_gcra_keys_are_independent():
+    limit = RateLimit("verify", rate=1, period=60.0, burst=1)
+    store = InMemoryStore()
+
+    assert store.consume("a", 0.0, limit.emission_interval, limit.tolerance)[0]
+    assert store.consume("b", 0.0, limit.emission_interval, limit.tolerance)[0]
+    assert not store.consume("a", 0.0, limit.emission_interval, limit.tolerance)[0]
+
+
+def test_sweep_drops_only_idle_keys():
+    store = InMemoryStore(max_keys=2)
+    store.consume("old", 0.0, 1.0, 1.0)
+    store.consume("recent", 100.0, 1.0, 1.0)
+    store.consume("new", 100.5, 1.0, 1.0)
+
+    assert set(store._tats) == {"recent", "new"}
+
+
+def test_charge_consumes_cost_tokens():
+    limit = RateLimit("batch", rate=60, period=60.0, burst=10)
+    store = InMemoryStore()
+
+    assert asyncio.run(charge(store, limit, "c", 10))[0]
+    allowed, retry_after = asyncio.run(charge(store, limit, "c", 5))
+    assert not allowed
+    assert 4.0 < retry_after <= 5.0
+
+
+def limited_client(**kwargs):
+    """An app allowing one request per client per minute"""
+    limit = RateLimit("default", rate=1, period=60.0, burst=1)
+    return TestClient(RateLimitMiddleware(PlainTextResponse("ok"), InMemoryStore(), limit, limit, **kwargs))
+
+
+def statuses(client, requests):
+    return [client.get("/", headers=headers).status_code for headers in requests]
+
+
+def test_configured_api_keys_get_their_own_budget():
+    client = limited_client(api_keys=["partner"])
+
+    assert statuses(client, [{"X-API-Key": "partner"}, {"X-API-Key": "partner"}]) == [200, 429]
+    # The IP's budget is separate from the key's
+    assert statuses(client, [{}]) == [200]
+
+
+def test_unknown_api_keys_are_limited_by_ip():
+    client = limited_client(api_keys=["partner"])
+
+    assert statuses(client, [{"X-API-Key": f"made-up-{i}"} for i in range(3)]) == [200, 429, 429]
+
+
+def test_spoofed_forwarded_for_entries_are_ignored():
+    client = limited_client(proxy_hops=1)
+    # The client writes the left entries; the proxy appends the real address
+    spoofed = [{"X-Forwarded-For": f"198.51.100.{i}, 203.0.113.7"} for i in range(3)]
+
+    assert statuses(client, spoofed) == [200, 429, 429]
+    assert statuses(client, [{"X-Forwarded-For": "203.0.113.8"}]) == [200]
+
+
+def test_forwarded_for_counts_trusted_hops_from_the_right():
+    client = limited_client(proxy_hops=2)
+
+    assert statuses(client, [
+        {"X-Forwarded-For": "1.1.1.1, 203.0.113.7, 10.0.0.2"},
+        {"X-Forwarded-For": "2.2.2.2, 203.0.113.7, 10.0.0.3"},
+    ]) == [200, 429]
+
+
+def test_forwarded_for_ignored_without_trusted_proxies():
+    client = limited_client()
+
+    assert statuses(client, [{"X-Forwarded-For": f"203.0.113.{i}"} for i in range(2)]) == [200, 429]
+
+
+def test_rejection_sets_retry_after():
+    client = limited_client()
+    client.get("/")
+    response = client.get("/")
+
+    assert response.status_code == 429
+    assert response.json() == {"detail": "Rate limit exceeded"}
+    assert 59 <= int(response.headers["retry-after"]) <= 60
+
+
+def test_shed_requests_are_not_charged():
+    saturated = [True]
+    limit = RateLimit("verify", rate=1, period=60.0, burst=1)
+    client = TestClient(RateLimitMiddleware(
+        PlainTextResponse("ok"), InMemoryStore(), limit, limit,
+        expensive_paths=("/api/verify",), is_saturated=lambda: saturated[0],
+    ))
+
+    response = client.get("/api/verify")
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+    saturated[0] = False
+    assert statuses(client, [{}, {}]) == [200, 429]
+
+
+def test_verify_endpoint_rate_limited(make_server):
+    _, client = make_server(RATE_LIMIT_VERIFY_PER_MINUTE=2, RATE_LIMIT_VERIFY_BURST=2)
+
+    responses = [client.post("/api/verify", json={"address": f"addr{i}"}) for i in range(3)]
+
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[-1].headers["retry-after"] == "30"
+    # Cheap endpoints draw on the separate default budget
+    assert client.get("/api/stats").status_code == 200
+
+
+def test_rate_limiting_can_be_disabled(make_server):
+    _, client = make_server(RATE_LIMIT_ENABLED="false", RATE_LIMIT_VERIFY_PER_MINUTE=1, RATE_LIMIT_VERIFY_BURST=1)
+
+    assert {client.post("/api/verify", json={"address": f"addr{i}"}).status_code for i in range(3)} == {200}
+
+
+def test_verify_shed_when_interactive_queue_is_full(make_server):
+    _, client = make_server(MAX_PENDING_VERIFICATIONS=0)
+
+    response = client.post("/api/verify", json={"address": "addr"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
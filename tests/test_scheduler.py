@@ -0,0 +1,217 @@
+import asyncio
+import threading
+from collections import Counter
+
+import pytest
+
+from scheduler import PriorityScheduler, QueueFull, INTERACTIVE, BATCH, BACKGROUND
+
+
+async def wait_until(predicate):
+    while not predicate():
+        await asyncio.sleep(0.005)
+
+
+async def dispatch_order(scheduler, jobs):
+    """
+    Hold the scheduler's only worker, queue `jobs` as (priority, fn) pairs,
+    then release it; returns the values the jobs returned, in run order.
+    """
+    order = []
+    gate = threading.Event()
+    blocker = asyncio.ensure_future(scheduler.submit(gate.wait))
+    await wait_until(lambda: scheduler.stats()["classes"][INTERACTIVE]["running"])
+
+    futures = [asyncio.ensure_future(scheduler.submit(lambda f=fn: order.append(f()), priority=p)) for p, fn in jobs]
+    await wait_until(lambda: scheduler.queued() == len(jobs))
+    gate.set()
+    await asyncio.gather(blocker, *futures)
+    return order
+
+
+def tagged(priority, count):
+    return [(priority, lambda: priority)] * count
+
+
+def test_weighted_fair_queuing_shares_by_weight():
+    async def run():
+        scheduler = PriorityScheduler(concurrency=1, interactive_slo=60)
+        try:
+            return await dispatch_order(
+                scheduler, tagged(BACKGROUND, 30) + tagged(BATCH, 30) + tagged(INTERACTIVE, 30)
+            )
+        finally:
+            await scheduler.stop()
+
+    order = asyncio.run(run())
+
+    assert Counter(order[:22]) == {INTERACTIVE: 16, BATCH: 4, BACKGROUND: 2}
+    assert Counter(order) == {INTERACTIVE: 30, BATCH: 30, BACKGROUND: 30}
+
+
+def test_idle_class_does_not_bank_credit():
+    async def run():
+        scheduler = PriorityScheduler(concurrency=1, interactive_slo=60)
+        try:
+            # Interactive runs alone for a while, then both classes compete
+            await dispatch_order(scheduler, tagged(INTERACTIVE, 40))
+            return await dispatch_order(scheduler, tagged(BATCH, 10) + tagged(INTERACTIVE, 10))
+        finally:
+            await scheduler.stop()
+
+    order = asyncio.run(run())
+
+    assert Counter(order[:5])[BATCH] <= 1
+
+
+def test_throttled_class_does_not_bank_credit():
+    async def run():
+        # Any queued interactive job breaches a zero SLO, pausing batch work
+        scheduler = PriorityScheduler(concurrency=1, interactive_slo=0)
+
+        def recover():
+            scheduler.interactive_slo = 60
+            return "recovered"
+
+        try:
+            return await dispatch_order(
+                scheduler,
+                tagged(BATCH, 5) + tagged(INTERACTIVE, 39) + [(INTERACTIVE, recover)] + tagged(INTERACTIVE, 20),
+            )
+        finally:
+            await scheduler.stop()
+
+    order = asyncio.run(run())
+    recovered = order.index("recovered")
+
+    # Paused during the breach...
+    assert set(order[:recovered]) == {INTERACTIVE}
+    # ...and afterwards back to sharing by weight, not draining the batch backlog
+    assert Counter(order[recovered + 1:recovered + 6])[BATCH] <= 1
+    assert Counter(order)[BATCH] == 5
+
+
+def test_workers_reserved_for_interactive():
+    running = Counter()
+    peak = Counter()
+    lock = threading.Lock()
+
+    def job(priority):
+        with lock:
+            running[priority] += 1
+            peak[priority] = max(peak[priority], running[priority])
+        threading.Event().wait(0.05)
+        with lock:
+            running[priority] -= 1
+
+    async def run():
+        scheduler = PriorityScheduler(concurrency=3, reserved_interactive=2, interactive_slo=60)
+        try:
+            await asyncio.gather(
+                *(scheduler.submit(job, BATCH, priority=BATCH) for _ in range(4)),
+                *(scheduler.submit(job, INTERACTIVE) for _ in range(4)),
+            )
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(run())
+
+    assert peak[BATCH] == 1
+    assert peak[INTERACTIVE] >= 2
+
+
+def test_stats_report_throttling():
+    async def run():
+        scheduler = PriorityScheduler(concurrency=1, interactive_slo=0)
+        gate = threading.Event()
+        blocker = asyncio.ensure_future(scheduler.submit(gate.wait))
+        await wait_until(lambda: scheduler.stats()["classes"][INTERACTIVE]["running"])
+        queued = asyncio.ensure_future(scheduler.submit(lambda: None))
+        await wait_until(lambda: scheduler.queued(INTERACTIVE))
+        await asyncio.sleep(0.01)
+        stats = scheduler.stats()
+        gate.set()
+        await asyncio.gather(blocker, queued)
+        await scheduler.stop()
+        return stats
+
+    stats = asyncio.run(run())
+
+    assert stats["lower_classes_throttled"]
+    assert stats["classes"][INTERACTIVE]["queued"] == 1
+
+
+def test_submit_returns_results_and_errors():
+    async def run():
+        scheduler = PriorityScheduler(concurrency=2)
+        try:
+            assert await scheduler.submit(lambda x: x * 2, 21, priority=BATCH) == 42
+            with pytest.raises(ZeroDivisionError):
+                await scheduler.submit(lambda: 1 / 0)
+        finally:
+            await scheduler.stop()
+        return scheduler.stats()["classes"]
+
+    classes = asyncio.run(run())
+    assert classes[BATCH]["completed"] == 1
+    assert classes[INTERACTIVE]["failed"] == 1
+
+
+def test_submit_rejects_when_queue_full():
+    async def run():
+        scheduler = PriorityScheduler(concurrency=1, max_queue=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(scheduler.submit(release.wait, priority=BATCH))
+        await wait_until(lambda: scheduler.stats()["classes"][BATCH]["running"])
+        queued = asyncio.ensure_future(scheduler.submit(lambda: None, priority=BATCH))
+        await wait_until(lambda: scheduler.queued(BATCH))
+        try:
+            with pytest.raises(QueueFull):
+                await scheduler.submit(lambda: None, priority=BATCH)
+        finally:
+            release.set()
+            await asyncio.gather(running, queued)
+            await scheduler.stop()
+        return scheduler.stats()["classes"][BATCH]["rejected"]
+
+    assert asyncio.run(run()) == 1
+
+
+def test_batch_endpoint_runs_at_batch_priority(make_server):
+    _, client = make_server()
+
+    response = client.post("/api/verify/batch", json={"addresses": ["a1", "bad1"], "priority": "background"})
+
+    assert response.status_code == 200
+    assert [r["risk_level"] for r in response.json()] == ["safe", "invalid"]
+    stats = client.get("/api/scheduler").json()
+    assert stats["classes"][BACKGROUND]["completed"] == 2
+    assert stats["classes"][INTERACTIVE]["submitted"] == 0
+
+
+def test_batch_endpoint_limits_size(make_server):
+    _, client = make_server(MAX_BATCH_ADDRESSES=2)
+
+    response = client.post("/api/verify/batch", json={"addresses": ["a1", "a2", "a3"]})
+
+    assert response.status_code == 413
+
+
+def test_batch_charged_per_address(make_server):
+    _, client = make_server(RATE_LIMIT_BATCH_PER_MINUTE=60, RATE_LIMIT_BATCH_BURST=5)
+
+    first = client.post("/api/verify/batch", json={"addresses": [f"a{i}" for i in range(5)]})
+    second = client.post("/api/verify/batch", json={"addresses": ["b1", "b2"]})
+
+    assert first.status_code == 200
+    assert second.status_code == 429
+    assert second.headers["retry-after"] == "2"
+
+
+def test_batch_shed_when_batch_queue_is_full(make_server):
+    _, client = make_server(MAX_PENDING_BATCH_VERIFICATIONS=2)
+
+    response = client.post("/api/verify/batch", json={"addresses": ["a1", "a2", "a3"]})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
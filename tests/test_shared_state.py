@@ -0,0 +1,104 @@
+import os
+import asyncio
+import secrets
+import tempfile
+
+import pytest
+
+from launcher import effective_workers
+from shared_state import (
+    SOCKET_ENV, AUTHKEY_ENV, start_state_server, connect_from_env,
+    SharedRateLimitStore, SharedVersionCounter, SharedVerificationCache,
+)
+
+
+@pytest.fixture
+def state_server(monkeypatch):
+    """A running state server, with the env vars the launcher would give its workers"""
+    socket_path = os.path.join(tempfile.gettempdir(), f"ark-state-test-{os.getpid()}.sock")
+    authkey = secrets.token_bytes(16)
+    manager = start_state_server(socket_path, authkey)
+    monkeypatch.setenv(SOCKET_ENV, socket_path)
+    monkeypatch.setenv(AUTHKEY_ENV, authkey.hex())
+    yield {"ARK_STATE_SOCKET": socket_path, "ARK_STATE_AUTHKEY": authkey.hex()}
+    manager.shutdown()
+
+
+def test_connect_from_env_without_launcher(monkeypatch):
+    monkeypatch.setenv(SOCKET_ENV, "")
+    assert connect_from_env() is None
+
+
+def test_version_counter_is_shared_between_connections(state_server):
+    first = SharedVersionCounter(connect_from_env())
+    second = SharedVersionCounter(connect_from_env())
+
+    assert first.epoch == second.epoch
+    assert asyncio.run(first.bump()) == 1
+    assert asyncio.run(second.bump()) == 2
+    assert asyncio.run(first.current()) == 2
+
+
+def test_verification_cache_is_shared_between_connections(state_server):
+    first = SharedVerificationCache(connect_from_env(), ttl=30)
+    second = SharedVerificationCache(connect_from_env(), ttl=30)
+
+    stored = asyncio.run(first.put("addr", {"address": "addr", "is_valid": True}))
+    hit = asyncio.run(second.get("addr"))
+
+    assert hit.result == {"address": "addr", "is_valid": True}
+    assert hit.etag == stored.etag
+    assert asyncio.run(second.get("other")) is None
+
+
+def test_verification_cache_entries_expire(state_server):
+    cache = SharedVerificationCache(connect_from_env(), ttl=-1)
+    asyncio.run(cache.put("addr", {"address": "addr"}))
+
+    assert asyncio.run(cache.get("addr")) is None
+
+
+def test_rate_limit_buckets_are_shared_between_connections(state_server):
+    first = SharedRateLimitStore(connect_from_env())
+    second = SharedRateLimitStore(connect_from_env())
+
+    # One token of burst: the second worker sees the first worker's request
+    assert asyncio.run(first.acquire("verify:1.2.3.4", 100.0, 10.0, 10.0))[0]
+    allowed, retry_after = asyncio.run(second.acquire("verify:1.2.3.4", 100.0, 10.0, 10.0))
+    assert not allowed
+    assert retry_after == pytest.approx(10.0)
+
+
+def test_workers_share_rate_limits(state_server, make_server):
+    limits = {"RATE_LIMIT_VERIFY_PER_MINUTE": 1, "RATE_LIMIT_VERIFY_BURST": 1, **state_server}
+
+    _, first = make_server(**limits)
+    assert first.post("/api/verify", json={"address": "addr1"}).status_code == 200
+
+    _, second = make_server(**limits)
+    assert second.post("/api/verify", json={"address": "addr2"}).status_code == 429
+
+
+def test_workers_share_cached_verifications(state_server, make_server):
+    _, first = make_server(**state_server)
+    fresh = first.get("/api/verify/addr")
+
+    def no_rpc(address, deadline=None):
+        raise AssertionError("cache miss")
+
+    _, second = make_server(verify=no_rpc, **state_server)
+    cached = second.get("/api/verify/addr")
+    revalidated = second.get("/api/verify/addr", headers={"If-None-Match": fresh.headers["etag"]})
+
+    assert cached.status_code == 200
+    assert cached.json() == fresh.json()
+    assert revalidated.status_code == 304
+
+
+def test_launcher_runs_one_worker_without_mongodb(monkeypatch):
+    monkeypatch.setenv("MONGO_URL", "")
+    assert effective_workers(4) == 1
+
+    monkeypatch.setenv("MONGO_URL", "mongodb://localhost:27017")
+    assert effective_workers(4) == 4
+    assert effective_workers(0) == 1
@@ -0,0 +1,74 @@
+import pandas as pd
+
+from snapshot import SnapshotSource, build_snapshot
+from solana_service import SolanaService
+
+
+def make_snapshot(path):
+    df = pd.DataFrame({
+        "address": ["Cc11", "Aa11", "Bb11", "Aa11"],
+        "lamports": [300, 100, 200, 150],
+        "tx_count": [3, 1, 2, 5],
+    })
+    return build_snapshot(df, path, slot=42)
+
+
+def test_build_snapshot_sorts_and_deduplicates(tmp_path):
+    assert make_snapshot(tmp_path) == 3
+
+    snapshot = SnapshotSource(tmp_path)
+    assert [a.decode() for a in snapshot.addresses] == ["Aa11", "Bb11", "Cc11"]
+    assert snapshot.manifest["slot"] == 42
+    assert snapshot.manifest["accounts"] == 3
+
+
+def test_lookup_finds_rows(tmp_path):
+    make_snapshot(tmp_path)
+    snapshot = SnapshotSource(tmp_path)
+
+    # Duplicates keep the last row of the export
+    assert snapshot.get_lamports("Aa11") == 150
+    assert snapshot.get_transaction_count("Aa11") == 5
+    assert snapshot.get_lamports("Cc11") == 300
+    assert snapshot.get_transaction_count("Bb11") == 2
+
+
+def test_missing_addresses_hold_nothing(tmp_path):
+    make_snapshot(tmp_path)
+    snapshot = SnapshotSource(tmp_path)
+
+    # Before the first row, between rows, past the last row, and a prefix of a row
+    for address in ("A", "Ab", "Zz99", "Aa1"):
+        assert snapshot.get_lamports(address) == 0
+        assert snapshot.get_transaction_count(address) == 0
+
+
+WSOL = "So11111111111111111111111111111111111111112"
+USDC = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+
+
+def make_account_snapshot(path):
+    df = pd.DataFrame({"address": [WSOL], "lamports": [2_500_000_000], "tx_count": [150]})
+    build_snapshot(df, path)
+
+
+def test_solana_service_reads_snapshot_without_rpc(tmp_path):
+    make_account_snapshot(tmp_path)
+    # Nothing listens on the RPC URL, so any RPC call would fail
+    service = SolanaService("http://127.0.0.1:9", snapshot=SnapshotSource(tmp_path))
+
+    assert service.get_balance(WSOL) == 2.5
+    assert service.get_transaction_count(WSOL) == 150
+    assert service.get_balance(USDC) == 0.0
+    assert service.get_transaction_count(USDC) == 0
+
+
+def test_verify_endpoint_scores_from_snapshot(make_server, tmp_path):
+    make_account_snapshot(tmp_path)
+    _, client = make_server(verify=None, SOLANA_SNAPSHOT_PATH=tmp_path)
+
+    known = client.post("/api/verify", json={"address": WSOL}).json()
+    unknown = client.post("/api/verify", json={"address": USDC}).json()
+
+    assert (known["risk_level"], known["balance"], known["transaction_count"]) == ("safe", 2.5, 150)
+    assert (unknown["risk_level"], unknown["balance"], unknown["transaction_count"]) == ("risky", 0, 0)